@@ -1,12 +1,25 @@
+import hashlib
+
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
 from rest_framework import status
 from rest_framework.response import Response
 
+from api.serializers import BatchSerializer
 from recipes.models import Recipe
+from recipes.signals import recipes_marked
+from users.models import lock_user
 
 
+@transaction.atomic
 def manage_user_recipe(request, pk, model, serializer_class):
     recipe = get_object_or_404(Recipe, pk=pk)
+    # Та же блокировка, что у пакетных add_recipes и remove_recipes:
+    # иначе одиночный и пакетный запрос с одним рецептом изменят
+    # счётчики дважды.
+    lock_user(request.user.id)
 
     if request.method == 'POST':
         serializer = serializer_class(data={
@@ -27,3 +40,85 @@ def manage_user_recipe(request, pk, model, serializer_class):
         )
     item.delete()
     return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+def batch_results(ids, found, changed, statuses):
+    """Итог пакетной операции по каждому id.
+
+    statuses — пара статусов (изменено, уже было так) для найденных id.
+    """
+    changed = set(changed)
+    return Response({
+        'results': [
+            {
+                'id': pk,
+                'status': (
+                    'not_found' if pk not in found
+                    else statuses[0] if pk in changed
+                    else statuses[1]
+                ),
+            }
+            for pk in ids
+        ]
+    })
+
+
+def manage_user_recipes_batch(request, model):
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = serializer.validated_data['ids']
+    found = set(
+        Recipe.objects.filter(pk__in=ids).values_list('pk', flat=True)
+    )
+    recipe_ids = [pk for pk in ids if pk in found]
+
+    if request.method == 'POST':
+        added = model.objects.add_recipes(request.user.id, recipe_ids)
+        if added:
+            recipes_marked.send(
+                sender=model, user_id=request.user.id, recipe_ids=added
+            )
+        return batch_results(ids, found, added, ('added', 'exists'))
+    removed = model.objects.remove_recipes(request.user.id, recipe_ids)
+    if removed:
+        recipes_marked.send(
+            sender=model, user_id=request.user.id, recipe_ids=removed
+        )
+    return batch_results(ids, found, removed, ('removed', 'missing'))
+
+
+def user_state_key(user):
+    """Часть ключа валидатора, зависящая от пользователя."""
+    if not user.is_authenticated:
+        return 'anonymous'
+    return f'{user.pk}:{user.state_updated_at}'
+
+
+def make_etag(key):
+    return quote_etag(hashlib.md5(key.encode()).hexdigest())
+
+
+def conditional_response(request, get_response, key, last_modified=None):
+    """Отвечает 304 Not Modified, если у клиента актуальная версия.
+
+    key — строка, которая меняется вместе с содержимым ответа, из неё
+    строится ETag. get_response вызывается, только если ответ нужно
+    построить заново. Если построенный ответ относится к другой версии
+    (например, устаревший ответ из кэша), get_response записывает её
+    ключ в атрибут etag_key ответа, и ETag строится из него.
+    """
+    etag = make_etag(key)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is None:
+        response = get_response()
+        etag = make_etag(getattr(response, 'etag_key', key))
+    if response.status_code in (status.HTTP_200_OK,
+                                status.HTTP_304_NOT_MODIFIED):
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+    patch_vary_headers(response, ['Authorization'])
+    return response
@@ -0,0 +1,210 @@
+"""Асинхронные варианты самых частых запросов на чтение.
+
+Обычные представления DRF синхронны: под gunicorn с sync-воркерами
+медленный запрос к базе занимает весь процесс. Эти представления
+работают под ASGI-сервером и ждут базу через асинхронный ORM, поэтому
+один воркер обслуживает много запросов одновременно. Ответы совпадают
+с ответами соответствующих эндпоинтов /api/.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.db.models import Value
+from django.http import HttpResponse
+from rest_framework.authentication import get_authorization_header
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import (AuthenticationFailed, NotAuthenticated,
+                                       NotFound)
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from api.filters import RecipeFilter
+from api.indexes import ingredient_index
+from api.paginations import Pagination
+from api.serializers import (FollowSerializer, RecipeReadSerializer,
+                             ShortRecipeSerializer)
+from api.views import RecipeViewSet
+from foodgram.constants import INGREDIENT_SEARCH_LIMIT
+from recipes.models import Recipe
+from users.models import User
+
+
+def render(data, status=200):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        content_type='application/json',
+        status=status,
+    )
+
+
+def error(exception):
+    response = render(
+        {'detail': str(exception.detail)}, exception.status_code
+    )
+    if exception.status_code == 401:
+        # Как у TokenAuthentication в представлениях DRF.
+        response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+async def authenticate(request):
+    """Пользователь по заголовку «Authorization: Token <ключ>».
+
+    Записывает его в request.user, как TokenAuthentication. Возвращает
+    None, если токен передан, но недействителен.
+    """
+    header = get_authorization_header(request).split()
+    if not header or header[0].lower() != b'token':
+        request.user = AnonymousUser()
+        return request.user
+    if len(header) != 2:
+        return None
+    try:
+        token = await Token.objects.select_related('user').aget(
+            key=header[1].decode()
+        )
+    except (Token.DoesNotExist, UnicodeError):
+        return None
+    if not token.user.is_active:
+        return None
+    request.user = token.user
+    return request.user
+
+
+def page_params(request):
+    limit = request.GET.get(Pagination.page_size_query_param, '')
+    limit = (
+        min(int(limit), Pagination.max_page_size)
+        if limit.isdigit() and int(limit) > 0
+        else settings.REST_FRAMEWORK['PAGE_SIZE']
+    )
+    page = request.GET.get(Pagination.page_query_param, '1')
+    return limit, int(page) if page.isdigit() else 0
+
+
+async def paginate(request, queryset, iterate=False):
+    """Страница в формате PageNumberPagination: count/next/previous.
+
+    iterate=True читает страницу через aiterator() — для выборок без
+    prefetch_related, которые aiterator() в Django 4.2 не выполняет.
+    """
+    limit, page = page_params(request)
+    count = await queryset.acount()
+    if page < 1 or (page - 1) * limit >= max(count, 1):
+        raise NotFound(PageNumberPagination.invalid_page_message)
+    rows = queryset[(page - 1) * limit:page * limit]
+    if iterate:
+        results = [row async for row in rows.aiterator()]
+    else:
+        results = [row async for row in rows]
+    url = request.build_absolute_uri()
+    param = Pagination.page_query_param
+    previous = None
+    if page > 1:
+        previous = (
+            remove_query_param(url, param)
+            if page == 2
+            else replace_query_param(url, param, page - 1)
+        )
+    return results, {
+        'count': count,
+        'next': (
+            replace_query_param(url, param, page + 1)
+            if page * limit < count else None
+        ),
+        'previous': previous,
+    }
+
+
+def filter_recipes(request, user):
+    # Проверка формы фильтра обращается к базе (фильтр author),
+    # поэтому выполняется в потоке.
+    filterset = RecipeFilter(
+        request.GET, queryset=Recipe.objects.for_read(user), request=request
+    )
+    if not filterset.is_valid():
+        return None, filterset.errors
+    queryset = filterset.qs
+    ordering = [
+        field.strip()
+        for field in request.GET.get('ordering', '').split(',')
+        if field.strip().lstrip('-') in RecipeViewSet.ordering_fields
+    ]
+    if ordering:
+        queryset = queryset.order_by(*ordering)
+    return queryset, None
+
+
+async def recipe_list(request):
+    user = await authenticate(request)
+    if user is None:
+        return error(AuthenticationFailed())
+    queryset, errors = await sync_to_async(filter_recipes)(request, user)
+    if errors:
+        return render(errors, 400)
+    try:
+        recipes, links = await paginate(request, queryset)
+    except NotFound as exception:
+        return error(exception)
+    links['results'] = RecipeReadSerializer(
+        recipes, many=True, context={'request': request}
+    ).data
+    return render(links)
+
+
+async def recipe_detail(request, pk):
+    user = await authenticate(request)
+    if user is None:
+        return error(AuthenticationFailed())
+    try:
+        recipe = await Recipe.objects.for_read(user).aget(pk=pk)
+    except Recipe.DoesNotExist:
+        # Тот же текст, что у get_object_or_404 в RecipeViewSet.
+        return error(NotFound(
+            f'No {Recipe._meta.object_name} matches the given query.'
+        ))
+    return render(
+        RecipeReadSerializer(recipe, context={'request': request}).data
+    )
+
+
+async def ingredient_list(request):
+    # Индекс ингредиентов в памяти; поток нужен только для его сборки.
+    return HttpResponse(
+        await sync_to_async(ingredient_index.search)(
+            request.GET.get('name', ''), INGREDIENT_SEARCH_LIMIT
+        ),
+        content_type='application/json',
+    )
+
+
+async def subscriptions(request):
+    user = await authenticate(request)
+    if user is None:
+        return error(AuthenticationFailed())
+    if not user.is_authenticated:
+        return error(NotAuthenticated())
+    authors = User.objects.filter(following__user=user).annotate(
+        is_subscribed=Value(True)
+    ).order_by('username', 'id')
+    try:
+        page, links = await paginate(request, authors, iterate=True)
+    except NotFound as exception:
+        return error(exception)
+    recipes_limit = request.GET.get('recipes_limit', '')
+    latest = {author.pk: [] for author in page}
+    recipes = Recipe.objects.only(
+        *ShortRecipeSerializer.Meta.fields, 'author', 'pub_date'
+    ).latest_for_authors(
+        list(latest),
+        int(recipes_limit) if recipes_limit.isdigit() else None,
+    )
+    async for recipe in recipes.aiterator():
+        latest[recipe.author_id].append(recipe)
+    for author in page:
+        author.latest_recipes = latest[author.pk]
+    links['results'] = FollowSerializer(
+        page, many=True, context={'request': request}
+    ).data
+    return render(links)
@@ -0,0 +1,233 @@
+import asyncio
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+
+@dataclass(frozen=True)
+class ConcurrencyEndpoint:
+    name: str
+    path: str
+    query: str = ''
+    auth: bool = False
+
+
+CONCURRENCY_ENDPOINTS = [
+    ConcurrencyEndpoint('recipes-list', 'recipes/', 'limit=6'),
+    ConcurrencyEndpoint('recipes-list-auth', 'recipes/', 'limit=6',
+                        auth=True),
+    ConcurrencyEndpoint('recipes-detail', 'recipes/{recipe_id}/',
+                        auth=True),
+    ConcurrencyEndpoint('ingredients-search', 'ingredients/',
+                        'name=ингр'),
+    ConcurrencyEndpoint('users-subscriptions', 'users/subscriptions/',
+                        'recipes_limit=3', auth=True),
+]
+
+# Сервер → префикс URL: синхронный WSGI-воркер и ASGI с обычными
+# представлениями DRF ходят в /api/, ASGI с асинхронными — в /api/async/.
+SERVERS = {
+    'wsgi': '/api/',
+    'asgi-sync': '/api/',
+    'asgi-async': '/api/async/',
+}
+
+
+@dataclass
+class ConcurrencyRun:
+    endpoint: str
+    server: str
+    concurrency: int
+    status: int = 0
+    wall: float = 0.0
+    peak_memory: int = 0
+    peak_threads: int = 0
+    latencies: list = field(default_factory=list)
+
+    @property
+    def rps(self):
+        return len(self.latencies) / self.wall
+
+    @property
+    def mean_latency(self):
+        return sum(self.latencies) / len(self.latencies)
+
+    @property
+    def achieved_concurrency(self):
+        # Закон Литтла: среднее число запросов в обработке.
+        return sum(self.latencies) / self.wall
+
+    @property
+    def memory_per_request(self):
+        # Память меряется на одной волне из concurrency запросов.
+        return self.peak_memory / self.concurrency
+
+
+@contextmanager
+def db_latency(seconds):
+    """Добавляет задержку перед каждым SQL-запросом.
+
+    Имитирует сетевую задержку до базы: поток спит, не удерживая GIL,
+    как при ожидании ответа от PostgreSQL. Обёртка ставится на уже
+    открытые соединения и на соединения, которые откроются в потоках
+    ASGI-обработчика.
+    """
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(install)
+    for connection in connections.all():
+        install(None, connection)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+        # Соединения потоков закрываются после каждого ответа, поэтому
+        # обёртку достаточно снять с соединений текущего потока.
+        for connection in connections.all():
+            if wrapper in connection.execute_wrappers:
+                connection.execute_wrappers.remove(wrapper)
+
+
+@contextmanager
+def timed(run):
+    """Время замера и наибольшее число потоков процесса."""
+    stop = threading.Event()
+
+    def count_threads():
+        while not stop.wait(0.005):
+            run.peak_threads = max(run.peak_threads, threading.active_count())
+
+    monitor = threading.Thread(target=count_threads, daemon=True)
+    monitor.start()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        run.wall = time.perf_counter() - started
+        stop.set()
+        monitor.join()
+        # Поток-наблюдатель в число потоков сервера не входит.
+        run.peak_threads -= 1
+
+
+@contextmanager
+def traced(run):
+    """Пик памяти Python сверх уже выделенной.
+
+    tracemalloc замедляет код в разы, поэтому память меряется отдельным
+    проходом, а не во время замера скорости.
+    """
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    try:
+        yield
+    finally:
+        run.peak_memory = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+
+
+def endpoint_url(endpoint, server, seeded):
+    return SERVERS[server] + endpoint.path.format(**seeded)
+
+
+def run_wsgi(endpoint, seeded, requests):
+    """Запросы по одному, как в синхронном воркере gunicorn."""
+    client = Client()
+    headers = {}
+    if endpoint.auth:
+        headers['HTTP_AUTHORIZATION'] = f'Token {seeded["token"]}'
+    url = endpoint_url(endpoint, 'wsgi', seeded)
+    query = endpoint.query.format(**seeded)
+    if query:
+        url += f'?{query}'
+    client.get(url, **headers)
+    run = ConcurrencyRun(endpoint.name, 'wsgi', 1)
+    with timed(run):
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(url, **headers)
+            run.latencies.append(time.perf_counter() - started)
+            run.status = response.status_code
+    with traced(run):
+        client.get(url, **headers)
+    return run
+
+
+async def asgi_get(application, path, query, headers):
+    """Один GET-запрос к ASGI-приложению без сетевого сервера."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver'), *headers],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+    status = 0
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    return status
+
+
+def run_asgi(endpoint, server, seeded, requests, concurrency):
+    """requests запросов, не больше concurrency одновременно.
+
+    Запросы идут в ASGIHandler, как из uvicorn: каждый в своём
+    ThreadSensitiveContext, так что синхронный код запроса выполняется
+    в отдельном потоке.
+    """
+    application = ASGIHandler()
+    path = endpoint_url(endpoint, server, seeded)
+    query = endpoint.query.format(**seeded)
+    headers = []
+    if endpoint.auth:
+        headers.append(
+            (b'authorization', f'Token {seeded["token"]}'.encode())
+        )
+    run = ConcurrencyRun(endpoint.name, server, concurrency)
+
+    async def one(semaphore):
+        async with semaphore:
+            started = time.perf_counter()
+            run.status = await asgi_get(application, path, query, headers)
+            run.latencies.append(time.perf_counter() - started)
+
+    async def main():
+        await asgi_get(application, path, query, headers)
+        semaphore = asyncio.Semaphore(concurrency)
+        with timed(run):
+            await asyncio.gather(*(one(semaphore) for _ in range(requests)))
+        with traced(run):
+            await asyncio.gather(*(
+                asgi_get(application, path, query, headers)
+                for _ in range(concurrency)
+            ))
+
+    asyncio.run(main())
+    return run
@@ -0,0 +1,240 @@
+import json
+import math
+import time
+from dataclasses import dataclass, field
+
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.caches import recipe_list_cache
+from api.filters import RecipeFilter
+from recipes.models import Recipe
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    name: str
+    url: str
+    auth: bool = False
+    paginated: bool = False
+    staff: bool = False
+
+
+ENDPOINTS = [
+    Endpoint('recipes-list', '/api/recipes/', paginated=True),
+    Endpoint('recipes-list-auth', '/api/recipes/', auth=True,
+             paginated=True),
+    Endpoint('recipes-list-cursor', '/api/recipes/?cursor=',
+             paginated=True),
+    Endpoint('recipes-by-author', '/api/recipes/?author={author_id}',
+             paginated=True),
+    Endpoint('recipes-favorited', '/api/recipes/?is_favorited=1',
+             auth=True, paginated=True),
+    Endpoint('recipes-in-cart', '/api/recipes/?is_in_shopping_cart=1',
+             auth=True, paginated=True),
+    Endpoint('recipes-search', '/api/recipes/?search=рецепт',
+             paginated=True),
+    Endpoint('recipes-by-ingredients',
+             '/api/recipes/?ingredients={ingredient_id}'
+             '&cooking_time_max=120', paginated=True),
+    Endpoint('recipes-no-ingredient',
+             '/api/recipes/?exclude_ingredients={ingredient_id}',
+             paginated=True),
+    Endpoint('recipes-detail', '/api/recipes/{recipe_id}/', auth=True),
+    Endpoint('recipes-similar', '/api/recipes/{recipe_id}/similar/'),
+    Endpoint('recipes-pantry',
+             '/api/recipes/pantry/?ingredients={ingredient_id}'),
+    Endpoint('download-shopping-cart',
+             '/api/recipes/download_shopping_cart/', auth=True),
+    Endpoint('ingredients-search', '/api/ingredients/?name=ингр'),
+    Endpoint('ingredients-detail', '/api/ingredients/{ingredient_id}/'),
+    Endpoint('users-list', '/api/users/', auth=True, staff=True,
+             paginated=True),
+    Endpoint('users-detail', '/api/users/{author_id}/', auth=True),
+    Endpoint('users-me', '/api/users/me/', auth=True),
+    Endpoint('users-subscriptions',
+             '/api/users/subscriptions/?recipes_limit=3', auth=True,
+             paginated=True),
+    Endpoint('recipes-feed', '/api/recipes/feed/', auth=True,
+             paginated=True),
+]
+
+
+INGREDIENT_INDEXES = (
+    'recipe_ingredient_ingredient', 'unique_recipe_ingredient'
+)
+
+
+@dataclass(frozen=True)
+class PlanCheck:
+    name: str
+    params: dict
+    indexes: tuple
+
+
+PLAN_CHECKS = [
+    PlanCheck('filter-ingredients', {'ingredients': '{ingredient_id}'},
+              INGREDIENT_INDEXES),
+    PlanCheck('filter-exclude-ingredients',
+              {'exclude_ingredients': '{ingredient_id}'},
+              INGREDIENT_INDEXES),
+    PlanCheck('filter-cooking-time', {'cooking_time_max': '10'},
+              ('recipe_cooking_time_pub_date',)),
+]
+
+
+@dataclass
+class Measurement:
+    endpoint: str
+    data_size: int
+    limit: int
+    status: int = 0
+    queries: int = 0
+    response_bytes: int = 0
+    timings: list = field(default_factory=list)
+
+    @property
+    def key(self):
+        return f'{self.endpoint}|{self.data_size}|{self.limit}'
+
+    def percentile(self, share):
+        ordered = sorted(self.timings)
+        index = max(math.ceil(share * len(ordered)) - 1, 0)
+        return ordered[index]
+
+    def as_dict(self):
+        return {
+            'endpoint': self.endpoint,
+            'data_size': self.data_size,
+            'limit': self.limit,
+            'status': self.status,
+            'queries': self.queries,
+            'bytes': self.response_bytes,
+            'p50_ms': round(self.percentile(0.5) * 1000, 3),
+            'p95_ms': round(self.percentile(0.95) * 1000, 3),
+        }
+
+
+def _response_size(response):
+    if getattr(response, 'streaming', False):
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def get(client, endpoint, url):
+    response = client.get(url)
+    if not 200 <= response.status_code < 300:
+        raise CommandError(
+            f'{endpoint.name}: {url} ответил {response.status_code}'
+        )
+    return response
+
+
+def measure(endpoint, seeded, data_size, limit, repeat):
+    client = APIClient()
+    if endpoint.auth:
+        token = seeded['staff_token' if endpoint.staff else 'token']
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+    url = endpoint.url.format(**seeded)
+    if endpoint.paginated:
+        url += ('&' if '?' in url else '?') + f'limit={limit}'
+
+    measurement = Measurement(endpoint.name, data_size, limit)
+    # Первый запрос прогревает кэши и в замеры не попадает.
+    _response_size(get(client, endpoint, url))
+    for _ in range(repeat):
+        # Иначе анонимные списки рецептов отдаются из кэша без запросов
+        # к базе, и рост числа запросов не виден.
+        recipe_list_cache.bump_ingredients()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = get(client, endpoint, url)
+            size = _response_size(response)
+            measurement.timings.append(time.perf_counter() - started)
+        measurement.status = response.status_code
+        measurement.queries = len(queries)
+        measurement.response_bytes = size
+    return measurement
+
+
+def find_query_growth(measurements):
+    """Ищет эндпоинты, у которых число запросов растёт с объёмом данных.
+
+    Для каждого эндпоинта число запросов должно быть одинаковым при любом
+    размере страницы и любом количестве данных в базе.
+    """
+    grouped = {}
+    for item in measurements:
+        grouped.setdefault(item.endpoint, []).append(item)
+    problems = []
+    for endpoint, items in grouped.items():
+        counts = {(item.data_size, item.limit): item.queries for item in items}
+        if len(set(counts.values())) > 1:
+            details = ', '.join(
+                f'data={data_size} limit={limit}: {count}'
+                for (data_size, limit), count in sorted(counts.items())
+            )
+            problems.append(f'{endpoint}: число запросов меняется ({details})')
+    return problems
+
+
+def find_unused_indexes(seeded):
+    """Проверяет по EXPLAIN, что фильтры рецептов берут свои индексы.
+
+    Проверяется только PostgreSQL, для которого индексы и заведены.
+    Последовательное чтение и сортировка на время EXPLAIN отключены:
+    на синтетических данных они бывают дешевле, а проверяется, что
+    само условие фильтра позволяет использовать индекс.
+    """
+    if connection.vendor != 'postgresql':
+        return []
+    problems = []
+    for check in PLAN_CHECKS:
+        queryset = RecipeFilter(
+            {
+                name: value.format(**seeded)
+                for name, value in check.params.items()
+            },
+            queryset=Recipe.objects.all(),
+        ).qs.order_by()
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+        if not any(index in plan for index in check.indexes):
+            problems.append(f'{check.name}: индекс не используется\n{plan}')
+    return problems
+
+
+def find_latency_regressions(measurements, baseline, tolerance):
+    problems = []
+    for item in measurements:
+        previous = baseline.get(item.key)
+        if previous is None:
+            continue
+        current = item.percentile(0.95) * 1000
+        allowed = previous['p95_ms'] * tolerance
+        if current > allowed:
+            problems.append(
+                f'{item.key}: p95 {current:.1f} мс, '
+                f'допустимо {allowed:.1f} мс'
+            )
+    return problems
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, measurements):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(
+            {item.key: item.as_dict() for item in measurements},
+            file, ensure_ascii=False, indent=2, sort_keys=True,
+        )
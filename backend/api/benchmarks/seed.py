@@ -0,0 +1,131 @@
+import io
+import random
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart)
+from users.models import Follow
+
+User = get_user_model()
+
+BENCH_USERNAME = 'bench_user'
+
+BENCH_STAFF_USERNAME = 'bench_staff'
+
+
+@transaction.atomic
+def seed(recipes=1000, users=None, ingredients=500,
+         ingredients_per_recipe=8, marked_share=0.2, seed_value=0):
+    """Заполняет базу синтетическими данными для бенчмарка.
+
+    Возвращает словарь с идентификаторами, которые нужны для построения
+    URL: пользователь бенчмарка, его токен, токен сотрудника, автор и
+    рецепт.
+    """
+    rnd = random.Random(seed_value)
+    users = users or max(recipes // 10, 2)
+    password = make_password(None)
+
+    User.objects.bulk_create(
+        User(
+            username=f'bench_{index}',
+            email=f'bench_{index}@example.com',
+            first_name='Бенч',
+            last_name=str(index),
+            password=password,
+        )
+        for index in range(users)
+    )
+    bench_user = User.objects.create(
+        username=BENCH_USERNAME,
+        email='bench_user@example.com',
+        first_name='Бенч',
+        last_name='Пользователь',
+        password=password,
+    )
+    # Полный список пользователей djoser показывает только персоналу.
+    staff_user = User.objects.create(
+        username=BENCH_STAFF_USERNAME,
+        email='bench_staff@example.com',
+        first_name='Бенч',
+        last_name='Персонал',
+        password=password,
+        is_staff=True,
+    )
+    authors = list(
+        User.objects.exclude(pk__in=[bench_user.pk, staff_user.pk])
+    )
+
+    Ingredient.objects.bulk_create(
+        Ingredient(
+            name=f'ингредиент {index:05d}',
+            measurement_unit=rnd.choice(['г', 'мл', 'шт.']),
+        )
+        for index in range(ingredients)
+    )
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+
+    now = timezone.now()
+    Recipe.objects.bulk_create(
+        Recipe(
+            author=authors[index % len(authors)],
+            name=f'Рецепт {index}',
+            image='recipes/bench.jpg',
+            text=f'Описание синтетического рецепта номер {index}.',
+            cooking_time=rnd.randint(1, 180),
+            pub_date=now - timezone.timedelta(minutes=index),
+        )
+        for index in range(recipes)
+    )
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+
+    RecipeIngredient.objects.bulk_create(
+        (
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rnd.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in rnd.sample(
+                ingredient_ids,
+                min(ingredients_per_recipe, len(ingredient_ids))
+            )
+        ),
+        batch_size=5000,
+    )
+
+    marked = rnd.sample(recipe_ids, int(len(recipe_ids) * marked_share))
+    Favorite.objects.bulk_create(
+        Favorite(user=bench_user, recipe_id=recipe_id)
+        for recipe_id in marked
+    )
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=bench_user, recipe_id=recipe_id)
+        for recipe_id in marked[:len(marked) // 2]
+    )
+    Follow.objects.bulk_create(
+        Follow(user=bench_user, following=author)
+        for author in authors[:max(int(len(authors) * marked_share), 1)]
+    )
+
+    # bulk_create не вызывает сигналы, поэтому счётчики, списки покупок
+    # и ленты пересчитываются.
+    call_command('recount_counters', stdout=io.StringIO())
+    call_command('check_shopping_lists', repair=True, stdout=io.StringIO())
+    call_command('rebuild_feeds', stdout=io.StringIO())
+
+    return {
+        'user': bench_user,
+        'token': Token.objects.create(user=bench_user).key,
+        'staff_token': Token.objects.create(user=staff_user).key,
+        'author_id': authors[0].id,
+        'recipe_id': recipe_ids[0],
+        'ingredient_id': ingredient_ids[0],
+    }
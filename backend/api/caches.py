@@ -0,0 +1,165 @@
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+
+STALE_TIMEOUT_FACTOR = 10
+
+LOCK_TIMEOUT = 10
+
+LOCK_WAIT = 1.0
+
+LOCK_POLL_INTERVAL = 0.05
+
+
+class RecipeListCache:
+    """Кэш ответов списка рецептов для анонимных пользователей.
+
+    Ключ ответа строится из адреса сайта, нормализованных параметров
+    запроса и версии: общей или, если список отфильтрован по одному
+    автору, версии автора вместе с версией справочника ингредиентов
+    (названия ингредиентов есть в рецептах любого автора). Версии —
+    случайные метки, их меняют сигналы при изменении рецептов,
+    ингредиентов и пользователей, поэтому старые ответы просто перестают
+    находиться. Пока один процесс строит новый ответ, остальные отдают
+    предыдущий (stale) или ждут его, а не идут в базу все сразу.
+    """
+
+    prefix = 'recipes:list'
+
+    @property
+    def cache(self):
+        return caches[settings.RECIPE_CACHE_ALIAS]
+
+    def version_key(self, author_id=None):
+        if author_id is None:
+            return f'{self.prefix}:version'
+        return f'{self.prefix}:version:author:{author_id}'
+
+    @property
+    def ingredients_version_key(self):
+        return f'{self.prefix}:version:ingredients'
+
+    def get_version(self, author_id=None):
+        return self.get_or_add_version(self.version_key(author_id))
+
+    def get_or_add_version(self, key):
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, uuid.uuid4().hex, timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    def bump(self, author_id=None):
+        self.bump_authors([] if author_id is None else [author_id])
+
+    def bump_authors(self, author_ids):
+        """Меняет общую версию и версии авторов author_ids."""
+        self.set_versions([
+            self.version_key(),
+            *(self.version_key(author_id) for author_id in author_ids),
+        ])
+
+    def bump_ingredients(self):
+        """Меняет общую версию и версии списков всех авторов."""
+        self.set_versions([self.version_key(), self.ingredients_version_key])
+
+    def set_versions(self, keys):
+        self.cache.set_many(
+            {key: uuid.uuid4().hex for key in keys}, timeout=None
+        )
+
+    @staticmethod
+    def normalize(query_params):
+        return '&'.join(
+            f'{name}={value}'
+            for name, values in sorted(query_params.lists())
+            for value in sorted(values)
+        )
+
+    def request_key(self, request):
+        # В ответе абсолютные ссылки на картинки и страницы, поэтому
+        # адрес сайта — часть ключа.
+        return (
+            f'{request.scheme}://{request.get_host()}'
+            f'?{self.normalize(request.query_params)}'
+        )
+
+    def version(self, request):
+        authors = request.query_params.getlist('author')
+        if len(authors) == 1 and authors[0].isdigit():
+            return (
+                f'{self.get_or_add_version(self.ingredients_version_key)}:'
+                f'{self.get_version(int(authors[0]))}'
+            )
+        return self.get_version()
+
+    def count(self, name):
+        key = f'{self.prefix}:stats:{name}'
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            self.cache.add(key, 0, timeout=None)
+            self.cache.incr(key)
+
+    def stats(self):
+        names = ['hit', 'miss', 'stale']
+        values = self.cache.get_many(
+            [f'{self.prefix}:stats:{name}' for name in names]
+        )
+        return {
+            name: values.get(f'{self.prefix}:stats:{name}', 0)
+            for name in names
+        }
+
+    def get_or_set(self, request, version, compute):
+        """Возвращает данные ответа и версию, к которой они относятся.
+
+        Данные берутся из кэша или строятся через compute. Пока другой
+        процесс строит ответ, отдаётся предыдущий (stale) со своей,
+        более старой версией.
+        """
+        params = hashlib.md5(self.request_key(request).encode()).hexdigest()
+        key = f'{self.prefix}:{version}:{params}'
+        stale_key = f'{self.prefix}:stale:{params}'
+        lock_key = f'{key}:lock'
+
+        data = self.cache.get(key)
+        if data is not None:
+            self.count('hit')
+            return data, version
+
+        locked = self.cache.add(lock_key, 1, timeout=LOCK_TIMEOUT)
+        if not locked:
+            stale = self.cache.get(stale_key)
+            if stale is not None:
+                self.count('stale')
+                return stale
+            deadline = time.monotonic() + LOCK_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(LOCK_POLL_INTERVAL)
+                data = self.cache.get(key)
+                if data is not None:
+                    self.count('hit')
+                    return data, version
+
+        self.count('miss')
+        try:
+            data = compute()
+            timeout = settings.RECIPE_CACHE_TIMEOUT
+            self.cache.set(key, data, timeout=timeout)
+            self.cache.set(
+                stale_key, (data, version),
+                timeout=timeout * STALE_TIMEOUT_FACTOR,
+            )
+        finally:
+            # Блокировку снимает только тот, кто её взял: иначе процесс,
+            # не дождавшийся ответа, снял бы чужую.
+            if locked:
+                self.cache.delete(lock_key)
+        return data, version
+
+
+recipe_list_cache = RecipeListCache()
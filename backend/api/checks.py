@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Версии кэшей и индексов должны быть общими для всех процессов.
+
+    Сигналы в воркере задач (и в других процессах сервера) меняют
+    версии списков рецептов и индексов в кэше; с кэшем в памяти
+    процесса эти изменения не видны процессам, которые отвечают на
+    запросы.
+    """
+    backend = settings.CACHES[settings.RECIPE_CACHE_ALIAS]['BACKEND']
+    if backend not in LOCAL_CACHE_BACKENDS or settings.JOBS_EAGER:
+        return []
+    return [
+        Warning(
+            f'Кэш {settings.RECIPE_CACHE_ALIAS!r} ({backend}) живёт в '
+            'памяти одного процесса, а задачи выполняет отдельный воркер: '
+            'изменения, сделанные в нём, не сбросят кэши списков рецептов '
+            'и индексов в процессах сервера.',
+            hint=(
+                'Задайте общий кэш через CACHE_BACKEND и CACHE_LOCATION '
+                '(например, django.core.cache.backends.redis.RedisCache) '
+                'или JOBS_EAGER=True для одного процесса.'
+            ),
+            id='api.W001',
+        )
+    ]
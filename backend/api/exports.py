@@ -0,0 +1,92 @@
+import csv
+from functools import lru_cache
+
+import fpdf
+from django.conf import settings
+
+from recipes.models import ShoppingListItem
+
+EXPORT_CHUNK_SIZE = 2000
+
+PDF_FONT_FAMILY = 'DejaVu'
+
+
+def shopping_cart_rows(user):
+    """Суммарные количества ингредиентов из списка покупок пользователя.
+
+    Суммы берутся из заранее посчитанных ShoppingListItem. Строки
+    читаются через .iterator(), поэтому в PostgreSQL используется
+    серверный курсор и весь список не держится в памяти.
+    """
+    return (
+        ShoppingListItem.objects
+        .filter(user=user)
+        .values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        )
+        .order_by('ingredient__name')
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def render_txt(rows):
+    for name, measurement_unit, amount in rows:
+        yield f'{name} ({measurement_unit}) — {amount}\n'
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(Echo())
+    yield '\ufeff'
+    yield writer.writerow(['Ингредиент', 'Единица измерения', 'Количество'])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+@lru_cache(maxsize=None)
+def get_pdf_font():
+    """Загружает кириллический шрифт один раз на процесс.
+
+    Разбор TTF-файла в FPDF.add_font — самая дорогая часть построения
+    PDF, поэтому метрики шрифта сохраняются и подставляются в каждый
+    новый документ.
+    """
+    fpdf.set_global('FPDF_CACHE_MODE', 1)
+    template = fpdf.FPDF()
+    template.add_font(PDF_FONT_FAMILY, '', settings.PDF_FONT_PATH, uni=True)
+    return template.fonts, template.font_files
+
+
+def new_pdf():
+    fonts, font_files = get_pdf_font()
+    pdf = fpdf.FPDF()
+    for key, font in fonts.items():
+        # Набор символов заполняется при выводе текста, у каждого
+        # документа он свой; метрики шрифта общие.
+        pdf.fonts[key] = {**font, 'subset': list(font['subset'])}
+    pdf.font_files.update(font_files)
+    return pdf
+
+
+def render_pdf(rows):
+    pdf = new_pdf()
+    pdf.add_page()
+    pdf.set_font(PDF_FONT_FAMILY, size=16)
+    pdf.cell(0, 10, 'Список покупок', ln=1)
+    pdf.set_font(PDF_FONT_FAMILY, size=12)
+    for name, measurement_unit, amount in rows:
+        pdf.cell(0, 8, f'{name} ({measurement_unit}) — {amount}', ln=1)
+    content = pdf.output(dest='S').encode('latin-1')
+    for start in range(0, len(content), EXPORT_CHUNK_SIZE * 32):
+        yield content[start:start + EXPORT_CHUNK_SIZE * 32]
+
+
+EXPORTS = {
+    'txt': render_txt,
+    'csv': render_csv,
+    'pdf': render_pdf,
+}
@@ -1,14 +1,111 @@
 import base64
+import binascii
+import re
 
 import rest_framework.serializers as slz
-from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import TemporaryUploadedFile
+
+from foodgram.constants import BASE64_DECODE_CHUNK, MAX_IMAGE_SIZE
+
+BASE64_MARKER = ';base64,'
+
+WHITESPACE = re.compile(r'\s+')
+
+
+def decoded_size(data, start):
+    """Размер данных после декодирования base64, без самого декодирования."""
+    length = len(data) - start
+    padding = len(data) - len(data.rstrip('=')) if data.endswith('=') else 0
+    return length * 3 // 4 - padding
+
+
+class DecodedFile(TemporaryUploadedFile):
+    """Временный файл, который хранилище может забрать себе переносом."""
+
+    def __del__(self):
+        # TemporaryUploadedFile.close() не падает, если файл уже перенесён.
+        self.close()
+
+
+def decode_base64_file(data, start, name, content_type):
+    """Декодирует base64 частями сразу во временный файл.
+
+    В памяти одновременно находится только одна порция, а не полная
+    декодированная копия картинки.
+    """
+    file = DecodedFile(name, content_type, 0, None)
+    for offset in range(start, len(data), BASE64_DECODE_CHUNK):
+        file.write(base64.b64decode(
+            data[offset:offset + BASE64_DECODE_CHUNK], validate=True
+        ))
+    file.size = file.tell()
+    file.seek(0)
+    return file
 
 
 class Base64ImageField(slz.ImageField):
+    """Картинка в виде data:image/...;base64,... или файла из multipart."""
+
+    default_error_messages = {
+        'too_large': 'Размер картинки не должен превышать {max_size} МБ.',
+        'invalid_base64': 'Некорректные данные base64.',
+    }
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name=f'temp.{ext}')
+            start = data.find(BASE64_MARKER)
+            if start == -1:
+                self.fail('invalid_base64')
+            content_type = data[len('data:'):start]
+            start += len(BASE64_MARKER)
+            if WHITESPACE.search(data, start):
+                # base64 в формате MIME разбит на строки.
+                data = data[:start] + WHITESPACE.sub('', data[start:])
+            if (len(data) - start) % 4:
+                self.fail('invalid_base64')
+            self.check_size(decoded_size(data, start))
+            ext = content_type.split('/')[-1]
+            try:
+                data = decode_base64_file(
+                    data, start, f'temp.{ext}', content_type
+                )
+            except binascii.Error:
+                self.fail('invalid_base64')
+        elif getattr(data, 'size', None) is not None:
+            self.check_size(data.size)
         return super().to_internal_value(data)
+
+    def check_size(self, size):
+        if size > MAX_IMAGE_SIZE:
+            self.fail('too_large', max_size=MAX_IMAGE_SIZE // (1024 * 1024))
+
+
+class ImageVariantsField(slz.ReadOnlyField):
+    """Ссылки на уменьшенные копии картинки: {размер: {формат: url}}.
+
+    Картинка берётся из поля с тем же именем без суффикса _variants.
+    Копии, построенные для прежней картинки, не отдаются: новые строит
+    фоновая задача.
+    """
+
+    def get_attribute(self, instance):
+        variants = super().get_attribute(instance) or {}
+        image = getattr(instance, self.field_name[:-len('_variants')])
+        if variants.get('source') != image.name:
+            return {}
+        return variants
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        variants = {}
+        for size, files in (value or {}).items():
+            if size == 'source':
+                continue
+            variants[size] = {}
+            for extension, name in files.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                variants[size][extension] = url
+        return variants
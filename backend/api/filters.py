@@ -1,17 +1,37 @@
 
 import django_filters
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db import connection
+from django.db.models import (Case, Exists, F, IntegerField, OuterRef, Q,
+                              Value, When)
+from django_filters.rest_framework import (BaseInFilter, BooleanFilter,
+                                           CharFilter, NumberFilter)
 
-from recipes.models import Recipe
-from django_filters.rest_framework import BooleanFilter
+from foodgram.constants import SEARCH_CONFIG
+from recipes.models import Recipe, RecipeIngredient
+
+
+class NumberInFilter(BaseInFilter, NumberFilter):
+    """Список чисел через запятую: ?ingredients=1,2,3."""
 
 
 class RecipeFilter(django_filters.FilterSet):
     is_favorited = BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = BooleanFilter(method='filter_is_in_shopping_cart')
+    search = CharFilter(method='filter_search')
+    ingredients = NumberInFilter(method='filter_ingredients')
+    exclude_ingredients = NumberInFilter(method='filter_exclude_ingredients')
+    cooking_time_max = NumberFilter(
+        field_name='cooking_time', lookup_expr='lte'
+    )
 
     class Meta:
         model = Recipe
-        fields = ['is_favorited', 'is_in_shopping_cart', 'author']
+        fields = [
+            'is_favorited', 'is_in_shopping_cart', 'author', 'search',
+            'ingredients', 'exclude_ingredients', 'cooking_time_max',
+        ]
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -22,3 +42,53 @@ class RecipeFilter(django_filters.FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(shopping_carts__user=self.request.user)
         return queryset
+
+    # EXISTS вместо JOIN: рецепт не размножается по строкам ингредиентов,
+    # и DISTINCT не нужен.
+    def filter_ingredients(self, queryset, name, value):
+        for ingredient_id in set(value):
+            queryset = queryset.filter(Exists(
+                RecipeIngredient.objects.filter(
+                    recipe=OuterRef('pk'), ingredient_id=ingredient_id
+                )
+            ))
+        return queryset
+
+    def filter_exclude_ingredients(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(~Exists(
+            RecipeIngredient.objects.filter(
+                recipe=OuterRef('pk'), ingredient_id__in=value
+            )
+        ))
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        if connection.vendor == 'postgresql':
+            return self.search_postgresql(queryset, value)
+        return self.search_fallback(queryset, value)
+
+    def search_postgresql(self, queryset, value):
+        query = SearchQuery(
+            value, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.annotate(
+            search_rank=SearchRank(F('search_vector'), query),
+            name_similarity=TrigramSimilarity('name', value),
+        ).filter(
+            Q(search_vector=query) | Q(name__trigram_similar=value)
+        ).order_by('-search_rank', '-name_similarity', '-pub_date')
+
+    def search_fallback(self, queryset, value):
+        return queryset.filter(
+            Q(name__icontains=value) | Q(text__icontains=value)
+        ).annotate(
+            search_rank=Case(
+                When(name__icontains=value, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+        ).order_by('-search_rank', '-pub_date')
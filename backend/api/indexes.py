@@ -0,0 +1,300 @@
+import heapq
+import json
+import math
+import threading
+import uuid
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import chain, groupby
+from operator import itemgetter
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from api.serializers import IngredientSerializer
+from foodgram.constants import SIMILAR_INDEX_SYNC_OVERLAP
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+
+def fold(value):
+    return value.casefold().replace('ё', 'е')
+
+
+def dump(row):
+    return json.dumps(row, ensure_ascii=False, separators=(',', ':'))
+
+
+class VersionedIndex:
+    """Индекс в памяти процесса с версией в общем кэше.
+
+    Сигналы меняют версию при изменении данных, и каждый процесс
+    обновляет свою копию индекса при следующем обращении.
+    """
+
+    version_key = None
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def invalidate(self):
+        cache.set(self.version_key, uuid.uuid4().hex, timeout=None)
+
+    def version(self):
+        return self.token(self.version_key)
+
+    @staticmethod
+    def token(key):
+        token = cache.get(key)
+        if token is None:
+            token = uuid.uuid4().hex
+            cache.add(key, token, timeout=None)
+            token = cache.get(key, token)
+        return token
+
+
+class IngredientIndex(VersionedIndex):
+    """Отсортированный индекс ингредиентов для поиска по началу названия.
+
+    Строится один раз на процесс и хранит уже сериализованные строки,
+    поэтому поиск не обращается к базе. При изменении ингредиентов
+    индекс перестраивается целиком.
+    """
+
+    version_key = 'ingredient_index_version'
+
+    def _build(self, version):
+        ingredients = sorted(
+            Ingredient.objects.all(),
+            key=lambda ingredient: (fold(ingredient.name), ingredient.name),
+        )
+        keys = [fold(ingredient.name) for ingredient in ingredients]
+        rows = [
+            dump(row).encode()
+            for row in IngredientSerializer(ingredients, many=True).data
+        ]
+        return version, keys, rows, b'[' + b','.join(rows) + b']'
+
+    def _get_state(self):
+        version = self.version()
+        state = self._state
+        if state is None or state[0] != version:
+            with self._lock:
+                state = self._state
+                if state is None or state[0] != version:
+                    state = self._state = self._build(version)
+        return state
+
+    def search(self, prefix, limit):
+        """Возвращает JSON-массив ингредиентов, начинающихся с prefix.
+
+        Не больше limit ингредиентов; без prefix — весь справочник без
+        ограничения, как отвечал /api/ingredients/ без name до индекса:
+        клиенты загружают по нему полный список. Этот ответ собран
+        заранее, поэтому стоит столько же, сколько поиск.
+        """
+        _, keys, rows, everything = self._get_state()
+        if not prefix:
+            return everything
+        prefix = fold(prefix)
+        start = bisect_left(keys, prefix)
+        found = []
+        for index in range(start, min(start + limit, len(keys))):
+            if not keys[index].startswith(prefix):
+                break
+            found.append(rows[index])
+        return b'[' + b','.join(found) + b']'
+
+
+def idf(recipes, containing):
+    """Сглаженный IDF ингредиента, который есть в containing рецептах."""
+    return math.log((1 + recipes) / (1 + containing)) + 1
+
+
+class RecipeIngredientState:
+    """Разреженная матрица рецепт × ингредиент в двух разрезах.
+
+    ingredients — {рецепт: ингредиенты}, postings — {ингредиент:
+    рецепты}, norms — {рецепт: квадрат нормы вектора}.
+    """
+
+    def __init__(self, version, generation, synced_at, ingredients,
+                 postings, norms):
+        self.version = version
+        self.generation = generation
+        self.synced_at = synced_at
+        self.ingredients = ingredients
+        self.postings = postings
+        self.norms = norms
+
+    def weight(self, ingredient_id):
+        return idf(
+            len(self.ingredients), len(self.postings.get(ingredient_id, ()))
+        ) ** 2
+
+    def norm(self, ingredient_ids):
+        return sum(self.weight(pk) for pk in ingredient_ids) or 1
+
+
+class RecipeIngredientIndex(VersionedIndex):
+    """Индекс рецептов по ингредиентам.
+
+    Отвечает, какие рецепты похожи на данный и что приготовить из
+    имеющихся продуктов. Для каждого ингредиента хранится множество
+    рецептов с ним, поэтому оба поиска считают пересечения в памяти,
+    без GROUP BY и самосоединений recipes_recipeingredient.
+
+    При изменении рецептов индекс не строится заново: дочитываются
+    только рецепты с updated_at после прошлой синхронизации (с запасом
+    SIMILAR_INDEX_SYNC_OVERLAP секунд на долгие транзакции); нормы
+    остальных рецептов пересчитываются при полной сборке. Удалённый
+    рецепт так не найти, поэтому удаление меняет поколение индекса
+    (rebuild() из сигнала), и все процессы строят его целиком.
+    Правка ингредиентов рецепта меняет его updated_at.
+    """
+
+    version_key = 'recipe_ingredient_index_version'
+    rebuild_key = 'recipe_ingredient_index_rebuild'
+
+    def rebuild(self):
+        """Требует построить индекс заново во всех процессах."""
+        cache.set(self.rebuild_key, uuid.uuid4().hex, timeout=None)
+
+    def _build(self, version, generation):
+        synced_at = timezone.now()
+        ingredients = dict.fromkeys(
+            Recipe.objects.values_list('pk', flat=True).iterator(), ()
+        )
+        rows = RecipeIngredient.objects.order_by(
+            'recipe_id', 'ingredient_id'
+        ).values_list('recipe_id', 'ingredient_id').iterator()
+        for recipe_id, group in groupby(rows, key=itemgetter(0)):
+            if recipe_id in ingredients:
+                ingredients[recipe_id] = tuple(pk for _, pk in group)
+        postings = defaultdict(set)
+        for recipe_id, ingredient_ids in ingredients.items():
+            for ingredient_id in ingredient_ids:
+                postings[ingredient_id].add(recipe_id)
+        state = RecipeIngredientState(
+            version, generation, synced_at, ingredients,
+            {pk: frozenset(recipes) for pk, recipes in postings.items()},
+            {},
+        )
+        state.norms = {
+            recipe_id: state.norm(ingredient_ids)
+            for recipe_id, ingredient_ids in ingredients.items()
+        }
+        return state
+
+    def _update(self, state, version):
+        synced_at = timezone.now()
+        changed = set(
+            Recipe.objects.filter(
+                updated_at__gte=state.synced_at - timedelta(
+                    seconds=SIMILAR_INDEX_SYNC_OVERLAP
+                )
+            ).values_list('pk', flat=True)
+        )
+        rows = RecipeIngredient.objects.filter(
+            recipe_id__in=changed
+        ).order_by('recipe_id', 'ingredient_id').values_list(
+            'recipe_id', 'ingredient_id'
+        )
+        fresh = dict.fromkeys(changed, ())
+        for recipe_id, group in groupby(rows, key=itemgetter(0)):
+            fresh[recipe_id] = tuple(pk for _, pk in group)
+
+        # Копия при записи: читающие потоки держат прежнее состояние.
+        ingredients = dict(state.ingredients)
+        postings = dict(state.postings)
+        removed, added = defaultdict(set), defaultdict(set)
+        for recipe_id, ingredient_ids in fresh.items():
+            for ingredient_id in ingredients.get(recipe_id, ()):
+                removed[ingredient_id].add(recipe_id)
+            for ingredient_id in ingredient_ids:
+                added[ingredient_id].add(recipe_id)
+            ingredients[recipe_id] = ingredient_ids
+        for ingredient_id in removed.keys() | added.keys():
+            postings[ingredient_id] = (
+                postings.get(ingredient_id, frozenset())
+                - removed[ingredient_id]
+            ) | added[ingredient_id]
+        updated = RecipeIngredientState(
+            version, state.generation, synced_at, ingredients, postings,
+            dict(state.norms),
+        )
+        for recipe_id, ingredient_ids in fresh.items():
+            updated.norms[recipe_id] = updated.norm(ingredient_ids)
+        return updated
+
+    def _get_state(self):
+        version = self.version()
+        generation = self.token(self.rebuild_key)
+        state = self._state
+        if (
+            state is None
+            or state.version != version
+            or state.generation != generation
+        ):
+            with self._lock:
+                state = self._state
+                if state is None or state.generation != generation:
+                    state = self._state = self._build(version, generation)
+                elif state.version != version:
+                    state = self._state = self._update(state, version)
+        return state
+
+    def similar(self, recipe_id, limit):
+        """id рецептов, похожих на recipe_id, от самых похожих.
+
+        Рецепт — вектор ингредиентов с весами IDF: чем реже ингредиент,
+        тем больше он говорит о сходстве. Похожесть — косинус между
+        векторами.
+
+        Возвращает None, если такого рецепта нет.
+        """
+        state = self._get_state()
+        ingredient_ids = state.ingredients.get(recipe_id)
+        if ingredient_ids is None:
+            return None
+        scores = defaultdict(float)
+        for ingredient_id in ingredient_ids:
+            weight = state.weight(ingredient_id)
+            for other in state.postings[ingredient_id]:
+                scores[other] += weight
+        scores.pop(recipe_id, None)
+        norms = state.norms
+        best = heapq.nlargest(
+            limit,
+            scores.items(),
+            key=lambda item: (item[1] / math.sqrt(norms[item[0]]), item[0]),
+        )
+        return [pk for pk, _ in best]
+
+    def cookable(self, ingredients, limit, max_missing=None):
+        """Рецепты, для которых есть больше всего ингредиентов.
+
+        Возвращает пары (id рецепта, сколько ингредиентов не хватает):
+        сначала рецепты, где не хватает меньше всего, при равенстве —
+        где больше ингредиентов из ingredients, затем новые.
+        """
+        state = self._get_state()
+        matched = Counter(chain.from_iterable(
+            state.postings.get(ingredient_id, ())
+            for ingredient_id in set(ingredients)
+        ))
+        ranked = (
+            (len(state.ingredients[recipe_id]) - count, -count, -recipe_id)
+            for recipe_id, count in matched.items()
+        )
+        if max_missing is not None:
+            ranked = (key for key in ranked if key[0] <= max_missing)
+        return [
+            (-recipe_id, missing)
+            for missing, _, recipe_id in heapq.nsmallest(limit, ranked)
+        ]
+
+
+ingredient_index = IngredientIndex()
+recipe_ingredient_index = RecipeIngredientIndex()
@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from api.benchmarks.runner import (ENDPOINTS, find_latency_regressions,
+                                   find_query_growth, find_unused_indexes,
+                                   load_baseline, measure, save_baseline)
+from api.benchmarks.seed import seed
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет число SQL-запросов, время ответа и размер ответа '
+        'для всех эндпоинтов API на синтетических данных во временной базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int_list, default=[200, 2000],
+            help='Количества рецептов в базе через запятую.',
+        )
+        parser.add_argument(
+            '--limits', type=int_list, default=[6, 50, 100],
+            help='Размеры страниц через запятую.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз повторять каждый запрос.',
+        )
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Замерять только указанные эндпоинты.',
+        )
+        parser.add_argument(
+            '--baseline', default=str(settings.BASE_DIR / 'benchmark.json'),
+            help='Файл с эталонными замерами.',
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Перезаписать эталон результатами текущего запуска.',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=1.5,
+            help='Допустимый рост p95 относительно эталона (множитель).',
+        )
+
+    def handle(self, *args, **options):
+        endpoints = [
+            endpoint for endpoint in ENDPOINTS
+            if not options['endpoints']
+            or endpoint.name in options['endpoints']
+        ]
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            measurements, problems = self.run(endpoints, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        problems += find_query_growth(measurements)
+        if options['update_baseline']:
+            save_baseline(options['baseline'], measurements)
+            self.stdout.write(f'Эталон сохранён в {options["baseline"]}')
+        else:
+            problems += find_latency_regressions(
+                measurements,
+                load_baseline(options['baseline']),
+                options['tolerance'],
+            )
+        if problems:
+            raise CommandError('\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('Регрессий не найдено.'))
+
+    def run(self, endpoints, options):
+        measurements = []
+        problems = []
+        self.stdout.write(
+            f'{"endpoint":<24}{"data":>7}{"limit":>7}{"status":>7}'
+            f'{"queries":>9}{"p50 ms":>9}{"p95 ms":>9}{"bytes":>10}'
+        )
+        for data_size in options['sizes']:
+            call_command('flush', interactive=False, verbosity=0)
+            seeded = seed(recipes=data_size)
+            for endpoint in endpoints:
+                limits = options['limits'] if endpoint.paginated else [0]
+                for limit in limits:
+                    item = measure(
+                        endpoint, seeded, data_size, limit, options['repeat']
+                    )
+                    measurements.append(item)
+                    row = item.as_dict()
+                    self.stdout.write(
+                        f'{item.endpoint:<24}{data_size:>7}{limit:>7}'
+                        f'{item.status:>7}{item.queries:>9}'
+                        f'{row["p50_ms"]:>9.1f}{row["p95_ms"]:>9.1f}'
+                        f'{item.response_bytes:>10}'
+                    )
+            # Планы проверяются на самом большом наборе данных.
+            if data_size == max(options['sizes']):
+                problems = find_unused_indexes(seeded)
+        return measurements, problems
@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from api.benchmarks.concurrency import (CONCURRENCY_ENDPOINTS, db_latency,
+                                        run_asgi, run_wsgi)
+from api.benchmarks.seed import seed
+from api.management.commands.benchmark import int_list
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает синхронный WSGI-воркер и ASGI с обычными и '
+        'асинхронными представлениями: достигнутую конкурентность на '
+        'воркер, пропускную способность и память на запрос в обработке.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', type=int, default=2000,
+            help='Количество рецептов в базе.',
+        )
+        parser.add_argument(
+            '--concurrency', type=int_list, default=[1, 10, 50],
+            help='Числа одновременных запросов к ASGI через запятую.',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Сколько запросов отправлять в каждом замере.',
+        )
+        parser.add_argument(
+            '--db-latency', type=float, default=5,
+            help='Задержка до базы на каждый SQL-запрос, мс.',
+        )
+        parser.add_argument(
+            '--endpoint', action='append', dest='endpoints',
+            help='Замерять только указанные эндпоинты.',
+        )
+
+    def handle(self, *args, **options):
+        endpoints = [
+            endpoint for endpoint in CONCURRENCY_ENDPOINTS
+            if not options['endpoints']
+            or endpoint.name in options['endpoints']
+        ]
+        if not endpoints:
+            raise CommandError('Нет эндпоинтов для замера.')
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            seeded = seed(recipes=options['size'])
+            with db_latency(options['db_latency'] / 1000):
+                self.run(endpoints, seeded, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def run(self, endpoints, seeded, options):
+        self.stdout.write(
+            f'{"endpoint":<22}{"server":>12}{"conc":>6}{"status":>7}'
+            f'{"rps":>8}{"mean ms":>9}{"achieved":>10}{"KiB/req":>9}'
+            f'{"threads":>9}'
+        )
+        for endpoint in endpoints:
+            runs = [run_wsgi(endpoint, seeded, options['requests'])]
+            for concurrency in options['concurrency']:
+                for server in ('asgi-sync', 'asgi-async'):
+                    runs.append(run_asgi(
+                        endpoint, server, seeded,
+                        options['requests'], concurrency,
+                    ))
+            for run in runs:
+                self.stdout.write(
+                    f'{run.endpoint:<22}{run.server:>12}'
+                    f'{run.concurrency:>6}{run.status:>7}'
+                    f'{run.rps:>8.1f}{run.mean_latency * 1000:>9.1f}'
+                    f'{run.achieved_concurrency:>10.1f}'
+                    f'{run.memory_per_request / 1024:>9.1f}'
+                    f'{run.peak_threads:>9}'
+                )
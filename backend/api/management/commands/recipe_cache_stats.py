@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.caches import recipe_list_cache
+
+
+class Command(BaseCommand):
+    help = 'Показывает попадания и промахи кэша списков рецептов.'
+
+    def handle(self, *args, **options):
+        stats = recipe_list_cache.stats()
+        total = sum(stats.values())
+        for name, value in stats.items():
+            share = value / total * 100 if total else 0
+            self.stdout.write(f'{name}: {value} ({share:.1f}%)')
@@ -1,8 +1,174 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.backends.base.operations import BaseDatabaseOperations
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class Pagination(PageNumberPagination):
+    """Постраничная пагинация с необязательным режимом курсора.
+
+    Без параметра cursor ответ прежний: count/next/previous/results.
+    С параметром cursor (в том числе пустым) используется пагинация по
+    ключу: выборка продолжается с последней записи страницы по полям
+    cursor_ordering представления, без COUNT(*) и OFFSET, поэтому
+    вместе с ?ordering= он даёт 400. Вместо
+    queryset можно передать объект с методом keyset_page(ordering,
+    position, limit), который сам выбирает записи после position, и
+    атрибутом model для проверки курсора.
+    """
+
     page_size_query_param = 'limit'
     max_page_size = 100
     page_query_param = 'page'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    cursor_ordering_message = (
+        'Курсор листает только в порядке по умолчанию, '
+        'без параметра ordering.'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # Объекты с keyset_page (например, лента) листаются только
+        # по ключу.
+        self.use_cursor = hasattr(queryset, 'keyset_page') or (
+            self.cursor_query_param in request.query_params
+            and getattr(view, 'cursor_ordering', None) is not None
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+
+        if (
+            api_settings.ORDERING_PARAM in request.query_params
+            and getattr(view, 'ordering_fields', None)
+        ):
+            raise ValidationError(
+                {api_settings.ORDERING_PARAM: [self.cursor_ordering_message]}
+            )
+        self.request = request
+        self.ordering = view.cursor_ordering
+        page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param),
+            queryset.model,
+        )
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.invert(field) for field in ordering]
+        if hasattr(queryset, 'keyset_page'):
+            results = queryset.keyset_page(ordering, position, page_size + 1)
+        else:
+            queryset = queryset.order_by(*ordering)
+            if position is not None:
+                queryset = queryset.filter(self.after(ordering, position))
+            results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_position = self.previous_position = None
+        if results and (has_more or reverse):
+            self.next_position = self.position(results[-1])
+        if results and (position is not None) and (has_more or not reverse):
+            self.previous_position = self.position(results[0])
+        return results
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.cursor_link(self.next_position, reverse=False),
+            'previous': self.cursor_link(self.previous_position, reverse=True),
+            'results': data,
+        })
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def after(ordering, position):
+        """Условие «строго после position» для составного ключа."""
+        conditions = []
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {
+                previous.lstrip('-'): position[previous.lstrip('-')]
+                for previous in ordering[:index]
+            }
+            conditions.append(
+                Q(**equal) & Q(**{f'{name}__{lookup}': position[name]})
+            )
+        return reduce(or_, conditions)
+
+    def position(self, instance):
+        return {
+            field.lstrip('-'): getattr(instance, field.lstrip('-'))
+            for field in self.ordering
+        }
+
+    def decode_cursor(self, cursor, model):
+        """Позиция и направление из курсора.
+
+        Значения проверяются полями model, поэтому подделанный курсор
+        даёт 404, а не ошибку в filter().
+        """
+        if not cursor:
+            return None, False
+        names = [field.lstrip('-') for field in self.ordering]
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values, reverse = payload['p'], bool(payload['r'])
+            if (
+                not isinstance(values, list)
+                or len(values) != len(names)
+                or None in values
+            ):
+                raise ValueError
+            position = {
+                name: self.clean_value(model._meta.get_field(name), value)
+                for name, value in zip(names, values)
+            }
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    @staticmethod
+    def clean_value(field, value):
+        value = field.clean(value, None)
+        # На SQLite у целых полей нет валидаторов диапазона.
+        bounds = BaseDatabaseOperations.integer_field_ranges.get(
+            field.get_internal_type()
+        )
+        if bounds and not bounds[0] <= value <= bounds[1]:
+            raise ValueError
+        return value
+
+    def cursor_link(self, position, reverse):
+        if position is None:
+            return None
+        payload = json.dumps({
+            'p': [
+                value.isoformat() if hasattr(value, 'isoformat') else value
+                for value in position.values()
+            ],
+            'r': reverse,
+        })
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url,
+            self.cursor_query_param,
+            base64.urlsafe_b64encode(payload.encode()).decode(),
+        )
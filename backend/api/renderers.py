@@ -0,0 +1,57 @@
+import json
+
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingListRenderer(BaseRenderer):
+    """Выбор формата списка покупок через ?format= или заголовок Accept.
+
+    Сам файл отдаётся потоком из представления, рендерер нужен для
+    согласования формата и для ответов об ошибках.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        return json.dumps(data, ensure_ascii=False).encode()
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+
+class ShoppingListNegotiation(DefaultContentNegotiation):
+    """Неподходящий Accept не ошибка: формат задаёт ?format=, иначе текст.
+
+    Клиенты, которые присылают Accept: application/json, всегда
+    получали текстовый файл.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(
+                request, renderers, format_suffix
+            )
+        except NotAcceptable:
+            format_query = format_suffix or request.query_params.get(
+                self.settings.URL_FORMAT_OVERRIDE
+            )
+            if format_query:
+                renderers = self.filter_renderers(renderers, format_query)
+            return renderers[0], renderers[0].media_type
@@ -1,11 +1,16 @@
+import json
+
 import rest_framework.serializers as slz
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from rest_framework.exceptions import ValidationError
 
-from api.fields import Base64ImageField
-from foodgram.constants import MIN_COOKING_TIME_VALUE
+from api.fields import Base64ImageField, ImageVariantsField
+from foodgram.constants import (MAX_BATCH_SIZE, MAX_PANTRY_INGREDIENTS,
+                                MIN_COOKING_TIME_VALUE, PANTRY_RECIPES_LIMIT,
+                                PANTRY_RECIPES_MAX_LIMIT)
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
                             ShoppingCart)
 from users.models import Follow
@@ -33,11 +38,16 @@ class BaseUserRecipeSerializer(slz.ModelSerializer):
 class UserSerializer(DjoserUserSerializer):
     is_subscribed = slz.SerializerMethodField()
     avatar = slz.ImageField(required=False, allow_null=True)
+    avatar_variants = ImageVariantsField()
 
     class Meta(DjoserUserSerializer.Meta):
-        fields = DjoserUserSerializer.Meta.fields + ('is_subscribed', 'avatar')
+        fields = DjoserUserSerializer.Meta.fields + (
+            'is_subscribed', 'avatar', 'avatar_variants'
+        )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         user = self.context.get('request').user
         return (
             user.is_authenticated
@@ -51,7 +61,9 @@ class UserSerializer(DjoserUserSerializer):
 
 
 class RecipeIngredientSerializer(slz.ModelSerializer):
-    id = slz.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    # Существование ингредиентов проверяет RecipeWriteSerializer
+    # одним запросом на весь список.
+    id = slz.IntegerField()
     amount = slz.IntegerField(min_value=1)
 
     class Meta:
@@ -68,20 +80,28 @@ class IngredientSerializer(slz.ModelSerializer):
 class RecipeReadSerializer(slz.ModelSerializer):
     is_favorited = slz.SerializerMethodField()
     is_in_shopping_cart = slz.SerializerMethodField()
-    author = UserSerializer(read_only=True)
+    author = slz.SerializerMethodField()
     ingredients = slz.SerializerMethodField()
 
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text',
+            'is_in_shopping_cart', 'name', 'image', 'image_variants', 'text',
             'cooking_time',
         )
 
+    def get_author(self, obj):
+        if hasattr(obj, 'author_is_subscribed'):
+            obj.author.is_subscribed = obj.author_is_subscribed
+        return UserSerializer(obj.author, context=self.context).data
+
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context.get('request').user
         return (
             user.is_authenticated
@@ -89,6 +109,8 @@ class RecipeReadSerializer(slz.ModelSerializer):
         )
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context.get('request').user
         return (
             user.is_authenticated
@@ -114,8 +136,25 @@ class RecipeWriteSerializer(slz.ModelSerializer):
         fields = ('name', 'image', 'text', 'ingredients', 'cooking_time')
 
     def to_representation(self, instance):
+        instance = Recipe.objects.for_read(
+            self.context['request'].user
+        ).get(pk=instance.pk)
         return RecipeReadSerializer(instance, context=self.context).data
 
+    def to_internal_value(self, data):
+        if hasattr(data, 'getlist'):
+            # multipart/form-data: картинка приходит файлом, а ингредиенты
+            # строкой с JSON.
+            data = data.dict()
+            if isinstance(data.get('ingredients'), str):
+                try:
+                    data['ingredients'] = json.loads(data['ingredients'])
+                except ValueError:
+                    raise ValidationError(
+                        {"ingredients": ["Ожидается список в формате JSON."]}
+                    )
+        return super().to_internal_value(data)
+
     def validate_cooking_time(self, value):
         if value < MIN_COOKING_TIME_VALUE:
             raise ValidationError(
@@ -128,6 +167,23 @@ class RecipeWriteSerializer(slz.ModelSerializer):
             )
         return value
 
+    def validate_ingredients(self, value):
+        ingredients = Ingredient.objects.in_bulk(
+            {item['id'] for item in value}
+        )
+        errors = [
+            {} if item['id'] in ingredients else {
+                'id': [
+                    f'Недопустимый первичный ключ "{item["id"]}" - '
+                    'объект не существует.'
+                ]
+            }
+            for item in value
+        ]
+        if any(errors):
+            raise ValidationError(errors)
+        return value
+
     def validate(self, data):
         ingredients_data = data.get('ingredients', [])
 
@@ -144,61 +200,80 @@ class RecipeWriteSerializer(slz.ModelSerializer):
 
         return data
 
-    def create_recipe_ingredients(self, recipe, ingredients_data):
-        recipe_ingredients = [
-            RecipeIngredient(
-                recipe=recipe,
-                ingredient=item['id'],
-                amount=item['amount']
-            )
-            for item in ingredients_data
-        ]
-        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+    @staticmethod
+    def ingredient_amounts(ingredients_data):
+        return {item['id']: item['amount'] for item in ingredients_data}
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients_data = validated_data.pop('ingredients')
         user = self.context['request'].user
         recipe = Recipe.objects.create(author=user, **validated_data)
 
-        self.create_recipe_ingredients(recipe, ingredients_data)
+        recipe.set_ingredients(self.ingredient_amounts(ingredients_data))
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('ingredients')
 
-        instance.ingredients.clear()
-        self.create_recipe_ingredients(instance, ingredients_data)
+        old_image = instance.image.name
+        new_amounts = self.ingredient_amounts(ingredients_data)
+        old_amounts = instance.set_ingredients(new_amounts)
+        instance.update_shopping_lists(old_amounts, new_amounts)
 
-        return super().update(instance, validated_data)
+        recipe = super().update(instance, validated_data)
+        if 'image' in validated_data:
+            # Новая картинка уже сохранена и получила свою ссылку,
+            # даже если это тот же самый файл.
+            recipe.image.storage.delete(old_image)
+        return recipe
 
 
 class ShortRecipeSerializer(slz.ModelSerializer):
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ("id", "name", "image", "cooking_time")
+        fields = ("id", "name", "image", "image_variants", "cooking_time")
+
+
+class PantryRecipeSerializer(ShortRecipeSerializer):
+    missing = slz.IntegerField(read_only=True)
+
+    class Meta(ShortRecipeSerializer.Meta):
+        fields = ShortRecipeSerializer.Meta.fields + ('missing',)
 
 
 class FollowSerializer(UserSerializer):
     recipes = slz.SerializerMethodField()
-    recipes_count = slz.ReadOnlyField(source='recipes.count')
+    recipes_count = slz.ReadOnlyField()
 
     class Meta(UserSerializer.Meta):
         fields = (
             'email', 'id', 'username', 'first_name', 'last_name',
-            'is_subscribed', 'avatar', 'recipes', 'recipes_count'
+            'is_subscribed', 'avatar', 'avatar_variants', 'recipes',
+            'recipes_count'
         )
 
-    def get_recipes(self, obj):
-        request = self.context.get('request')
+    @staticmethod
+    def recipes_limit(request):
         recipes_limit = request.query_params.get(
             'recipes_limit') if request else None
-
-        recipes = obj.recipes.all()
-
         if recipes_limit and recipes_limit.isdigit():
-            recipes = recipes[:int(recipes_limit)]
+            return int(recipes_limit)
+        return None
+
+    def get_recipes(self, obj):
+        # Страница подписок подгружает рецепты всех авторов заранее.
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
+        else:
+            recipes = obj.recipes.all()
+            recipes_limit = self.recipes_limit(self.context.get('request'))
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
 
         return ShortRecipeSerializer(
             recipes, many=True, context=self.context
@@ -239,3 +314,29 @@ class FavoriteSerializer(BaseUserRecipeSerializer):
 class ShoppingCartSerializer(BaseUserRecipeSerializer):
     class Meta(BaseUserRecipeSerializer.Meta):
         model = ShoppingCart
+
+
+class BatchSerializer(slz.Serializer):
+    ids = slz.ListField(
+        child=slz.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BATCH_SIZE,
+    )
+
+    def validate_ids(self, value):
+        # Повторы не ошибка: офлайн-клиент может отправить действие дважды.
+        return list(dict.fromkeys(value))
+
+
+class PantrySerializer(slz.Serializer):
+    ingredients = slz.ListField(
+        child=slz.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_PANTRY_INGREDIENTS,
+    )
+    max_missing = slz.IntegerField(min_value=0, required=False)
+    limit = slz.IntegerField(
+        min_value=1,
+        max_value=PANTRY_RECIPES_MAX_LIMIT,
+        default=PANTRY_RECIPES_LIMIT,
+    )
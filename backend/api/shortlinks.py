@@ -0,0 +1,90 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+
+from foodgram.constants import (BASE62_ALPHABET, BASE62_DIVIDER,
+                                SHORT_LINK_CACHE_TIMEOUT,
+                                SHORT_LINK_LOCAL_TIMEOUT,
+                                SHORT_LINK_LRU_SIZE, SHORT_LINK_MAX_LENGTH,
+                                SHORT_LINK_MISS_TIMEOUT)
+from recipes.models import Recipe
+
+BASE62_VALUES = {char: value for value, char in enumerate(BASE62_ALPHABET)}
+
+
+def encode(number):
+    """Код короткой ссылки: id в base62, без обращения к базе."""
+    code = ''
+    while True:
+        number, remainder = divmod(number, BASE62_DIVIDER)
+        code = BASE62_ALPHABET[remainder] + code
+        if not number:
+            return code
+
+
+def decode(code):
+    """id по коду или None, если код не выдавался encode."""
+    if not code or len(code) > SHORT_LINK_MAX_LENGTH:
+        return None
+    number = 0
+    for char in code:
+        value = BASE62_VALUES.get(char)
+        if value is None:
+            return None
+        number = number * BASE62_DIVIDER + value
+    # Коды с ведущими нулями — другие ссылки на тот же id.
+    if encode(number) != code:
+        return None
+    return number
+
+
+class RecipeLinks:
+    """Проверка существования рецептов для коротких ссылок.
+
+    Ответ ищется в LRU процесса, затем в общем кэше и только потом в
+    базе, поэтому всплеск переходов по одной ссылке не доходит до базы.
+    Сигналы удаляют ответ из общего кэша при создании и удалении
+    рецепта; в LRU других процессов он живёт не дольше
+    SHORT_LINK_LOCAL_TIMEOUT секунд.
+    """
+
+    prefix = 'recipes:exists'
+
+    def __init__(self, size=SHORT_LINK_LRU_SIZE):
+        self.size = size
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+
+    def key(self, pk):
+        return f'{self.prefix}:{pk}'
+
+    def exists(self, pk):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(pk)
+            if entry is not None and entry[1] > now:
+                self._local.move_to_end(pk)
+                return entry[0]
+        found = cache.get(self.key(pk))
+        if found is None:
+            found = Recipe.objects.filter(pk=pk).exists()
+            cache.set(
+                self.key(pk), found,
+                SHORT_LINK_CACHE_TIMEOUT if found else SHORT_LINK_MISS_TIMEOUT,
+            )
+        with self._lock:
+            self._local[pk] = (found, now + SHORT_LINK_LOCAL_TIMEOUT)
+            self._local.move_to_end(pk)
+            if len(self._local) > self.size:
+                self._local.popitem(last=False)
+        return found
+
+    def forget(self, pk):
+        cache.delete(self.key(pk))
+        with self._lock:
+            self._local.pop(pk, None)
+
+
+recipe_links = RecipeLinks()
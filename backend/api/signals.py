@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.caches import recipe_list_cache
+from api.indexes import ingredient_index, recipe_ingredient_index
+from api.shortlinks import recipe_links
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart)
+from recipes.signals import ingredients_loaded, recipes_marked
+
+User = get_user_model()
+
+
+def invalidate_recipe_lists_by_recipes(recipe_ids):
+    transaction.on_commit(lambda: recipe_list_cache.bump_authors(
+        Recipe.objects.filter(pk__in=recipe_ids)
+        .values_list('author_id', flat=True)
+        .distinct()
+    ))
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver(ingredients_loaded, sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    ingredient_index.invalidate()
+    transaction.on_commit(recipe_list_cache.bump_ingredients)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def invalidate_recipe_ingredient_index(**kwargs):
+    # Правка RecipeIngredient меняет updated_at рецепта
+    # (recipes.signals.touch_recipe_by_ingredient), поэтому индекс
+    # пересчитает его при следующей синхронизации.
+    transaction.on_commit(recipe_ingredient_index.invalidate)
+
+
+@receiver(post_delete, sender=Recipe)
+def rebuild_recipe_ingredient_index(**kwargs):
+    transaction.on_commit(recipe_ingredient_index.rebuild)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def forget_recipe_link(instance, created=True, **kwargs):
+    # Несуществующий id мог попасть в кэш до создания рецепта.
+    if created:
+        transaction.on_commit(lambda: recipe_links.forget(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def invalidate_recipe_lists(instance, **kwargs):
+    transaction.on_commit(lambda: recipe_list_cache.bump(instance.author_id))
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def invalidate_recipe_lists_by_ingredient(instance, **kwargs):
+    invalidate_recipe_lists_by_recipes([instance.recipe_id])
+
+
+@receiver([post_save, post_delete], sender=Favorite)
+@receiver([post_save, post_delete], sender=ShoppingCart)
+def invalidate_recipe_lists_by_mark(instance, **kwargs):
+    # Счётчики избранного и корзины задают порядок списка
+    # (?ordering=-favorites_count).
+    invalidate_recipe_lists_by_recipes([instance.recipe_id])
+
+
+@receiver(recipes_marked)
+def invalidate_recipe_lists_by_marks(recipe_ids, **kwargs):
+    invalidate_recipe_lists_by_recipes(recipe_ids)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_author_recipe_lists(instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(lambda: recipe_list_cache.bump(instance.pk))
@@ -0,0 +1,149 @@
+import base64
+import json
+from unittest import mock
+
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from api.benchmarks.seed import seed
+from api.caches import recipe_list_cache
+from recipes.models import Favorite, Ingredient, Recipe
+from users.models import User
+
+
+def cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+class CursorPaginationTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seeded = seed(recipes=20)
+
+    def setUp(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.seeded["token"]}'
+        )
+
+    def test_cursor_pages_follow_each_other(self):
+        first = self.client.get('/api/recipes/?cursor=&limit=5').json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 5)
+        self.assertNotIn(
+            second['results'][0]['id'],
+            [recipe['id'] for recipe in first['results']],
+        )
+
+    def test_cursor_rejects_ordering(self):
+        for url in ('/api/recipes/', '/api/recipes/feed/'):
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, {'cursor': '', 'ordering': '-favorites_count'}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('ordering', response.json())
+
+    def test_tampered_cursor_is_not_found(self):
+        payloads = [
+            {'p': ['notadate', 1], 'r': False},
+            {'p': [None, None], 'r': False},
+            {'p': [{'a': 1}, 2], 'r': False},
+            {'p': ['2020-01-01T00:00:00+00:00', 'abc'], 'r': False},
+            {'p': ['2020-01-01T00:00:00+00:00', 10 ** 30], 'r': False},
+            {'p': ['2020-01-01T00:00:00+00:00'], 'r': False},
+            {'p': 1, 'r': False},
+            [1, 2],
+        ]
+        for url in ('/api/recipes/', '/api/recipes/feed/'):
+            for payload in payloads:
+                with self.subTest(url=url, payload=payload):
+                    response = self.client.get(
+                        url, {'cursor': cursor(payload)}
+                    )
+                    self.assertEqual(response.status_code, 404)
+        response = self.client.get('/api/recipes/', {'cursor': 'не base64'})
+        self.assertEqual(response.status_code, 404)
+
+
+class AnonymousRecipeListTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seeded = seed(recipes=5)
+
+    def setUp(self):
+        recipe_list_cache.cache.clear()
+
+    def test_stale_response_keeps_its_own_etag(self):
+        etag = self.client.get('/api/recipes/')['ETag']
+        recipe_list_cache.bump()
+        cache = recipe_list_cache.cache
+        add = cache.add
+
+        def locked(key, *args, **kwargs):
+            # Новый ответ уже строит другой процесс.
+            return not key.endswith(':lock') and add(key, *args, **kwargs)
+
+        with mock.patch.object(cache, 'add', locked), \
+                mock.patch('api.caches.LOCK_WAIT', 0):
+            stale = self.client.get('/api/recipes/')
+            self.assertEqual(stale['ETag'], etag)
+        self.assertEqual(stale.status_code, 200)
+        fresh = self.client.get('/api/recipes/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], etag)
+
+    def test_ingredient_rename_changes_author_list(self):
+        url = f'/api/recipes/?author={self.seeded["author_id"]}'
+        etag = self.client.get(url)['ETag']
+        ingredient = Ingredient.objects.filter(
+            recipes__author_id=self.seeded['author_id']
+        ).first()
+        ingredient.name = 'переименованный'
+        with self.captureOnCommitCallbacks(execute=True):
+            ingredient.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'переименованный')
+
+    @override_settings(
+        ALLOWED_HOSTS=['first.example.com', 'second.example.com']
+    )
+    def test_host_is_part_of_key(self):
+        self.client.get('/api/recipes/', HTTP_HOST='first.example.com')
+        response = self.client.get(
+            '/api/recipes/', HTTP_HOST='second.example.com'
+        )
+        self.assertIn(
+            'http://second.example.com/',
+            response.json()['results'][0]['image'],
+        )
+
+
+class RecipeListTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seeded = seed(recipes=5)
+
+    def setUp(self):
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {self.seeded["token"]}'
+        )
+
+    def test_favorites_change_ordered_list(self):
+        url = '/api/recipes/?ordering=-favorites_count'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            # Только проверка токена.
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        recipe = Recipe.objects.order_by('favorites_count').first()
+        with self.captureOnCommitCallbacks(execute=True):
+            Favorite.objects.create(
+                user=User.objects.create(username='fan', email='fan@ex.com'),
+                recipe=recipe,
+            )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
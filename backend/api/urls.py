@@ -2,6 +2,7 @@
 from django.urls import include, path
 from rest_framework import routers
 
+import api.async_views as avs
 import api.views as vs
 
 user_router = routers.DefaultRouter()
@@ -25,7 +26,19 @@ recipe_router.register(
     basename='ingredients'
 )
 
+async_urlpatterns = [
+    path('recipes/', avs.recipe_list, name='async-recipes'),
+    path('recipes/<int:pk>/', avs.recipe_detail, name='async-recipe'),
+    path('ingredients/', avs.ingredient_list, name='async-ingredients'),
+    path(
+        'users/subscriptions/',
+        avs.subscriptions,
+        name='async-subscriptions'
+    ),
+]
+
 urlpatterns = [
+    path('async/', include(async_urlpatterns)),
     path('', include(user_router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
     path('', include(recipe_router.urls)),
@@ -1,30 +1,45 @@
-import base64
-import os
-import uuid
-
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Value
+from django.http import (Http404, HttpResponse, HttpResponseRedirect,
+                         StreamingHttpResponse)
+from django.urls import reverse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet as DjoserUserViewSet
 from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter, SearchFilter
 from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
-from api.abstractions.views import manage_user_recipe
+from api.abstractions.views import (batch_results, conditional_response,
+                                    manage_user_recipe,
+                                    manage_user_recipes_batch, user_state_key)
+from api.caches import recipe_list_cache
+from api.exports import EXPORTS, shopping_cart_rows
+from api.fields import Base64ImageField
 from api.filters import RecipeFilter
+from api.indexes import ingredient_index, recipe_ingredient_index
 from api.paginations import Pagination
 from api.permissions import IsAuthorOrReadOnly
-from api.serializers import (FavoriteSerializer, FollowSerializer,
-                             IngredientSerializer, RecipeReadSerializer,
-                             RecipeWriteSerializer, ShoppingCartSerializer,
+from api.renderers import (CSVShoppingListRenderer, PDFShoppingListRenderer,
+                           ShoppingListNegotiation, TextShoppingListRenderer)
+from api.serializers import (BatchSerializer, FavoriteSerializer,
+                             FollowSerializer, IngredientSerializer,
+                             PantryRecipeSerializer, PantrySerializer,
+                             RecipeReadSerializer, RecipeWriteSerializer,
+                             ShoppingCartSerializer, ShortRecipeSerializer,
                              SubscriptionSerializer, UserSerializer)
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart)
-from users.models import Follow
+from api.shortlinks import decode, encode, recipe_links
+from foodgram.constants import (INGREDIENT_SEARCH_LIMIT,
+                                SIMILAR_RECIPES_LIMIT,
+                                SIMILAR_RECIPES_MAX_LIMIT)
+from recipes.feed import Feed
+from recipes.images import release_image
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+from users.models import Follow, lock_user
+from users.signals import followed, unfollowed
 
 User = get_user_model()
 
@@ -33,15 +48,34 @@ class UserViewSet(DjoserUserViewSet):
     queryset = User.objects.all().order_by('username')
     serializer_class = UserSerializer
     pagination_class = Pagination
+    cursor_ordering = ('username', 'id')
     permission_classes = [permissions.AllowAny]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list' and self.request.user.is_authenticated:
+            # Иначе UserSerializer проверяет подписку запросом на каждого.
+            queryset = queryset.annotate(is_subscribed=Exists(
+                Follow.objects.filter(
+                    user=self.request.user, following=OuterRef('pk')
+                )
+            ))
+        return queryset
+
     @action(detail=False,
             methods=['get'],
             permission_classes=[permissions.IsAuthenticated]
             )
     def me(self, request):
-        serializer = self.get_serializer(request.user)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        user = request.user
+        return conditional_response(
+            request,
+            lambda: Response(
+                self.get_serializer(user).data, status=status.HTTP_200_OK
+            ),
+            f'me:{user.pk}:{user.updated_at}',
+            user.updated_at,
+        )
 
     @action(detail=False,
             methods=['put', 'delete'],
@@ -61,16 +95,14 @@ class UserViewSet(DjoserUserViewSet):
                 )
 
             try:
-                if user.avatar:
-                    user.avatar.delete()
-
-                format, imgstr = avatar_data.split(';base64,')
-                ext = format.split('/')[-1]
-                data = ContentFile(base64.b64decode(imgstr),
-                                   name=f"{uuid.uuid4()}.{ext}")
+                data = Base64ImageField().run_validation(avatar_data)
+            except ValidationError as error:
+                raise ValidationError({"avatar": error.detail})
 
+            try:
+                old_avatar = user.avatar.name
                 user.avatar.save(data.name, data, save=True)
-                user.save()
+                user.avatar.storage.delete(old_avatar)
 
                 avatar_url = request.build_absolute_uri(user.avatar.url)
 
@@ -84,11 +116,9 @@ class UserViewSet(DjoserUserViewSet):
                 )
 
         if user.avatar:
-            avatar_path = user.avatar.path
-            if os.path.exists(avatar_path):
-                os.remove(avatar_path)
-            user.avatar.delete()
+            release_image(user.avatar, user.avatar_variants)
             user.avatar = None
+            user.avatar_variants = {}
             user.save()
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
@@ -104,9 +134,20 @@ class UserViewSet(DjoserUserViewSet):
     def get_subscriptions(self, request):
         user = request.user
 
-        subscriptions = User.objects.filter(following__user=user)
+        subscriptions = User.objects.filter(
+            following__user=user
+        ).annotate(is_subscribed=Value(True))
 
         page = self.paginate_queryset(subscriptions)
+        latest = Recipe.objects.only(
+            'author', 'name', 'image', 'image_variants', 'cooking_time',
+            'pub_date',
+        ).latest_by_author(
+            [author.pk for author in page],
+            FollowSerializer.recipes_limit(request),
+        )
+        for author in page:
+            author.latest_recipes = latest[author.pk]
 
         serializer = FollowSerializer(
             page, many=True, context={'request': request})
@@ -117,8 +158,11 @@ class UserViewSet(DjoserUserViewSet):
             url_path='subscribe',
             permission_classes=[permissions.IsAuthenticated]
             )
+    @transaction.atomic
     def manage_subscription(self, request, id=None):
         user = request.user
+        # Как у пакетных follow_many и unfollow_many.
+        lock_user(user.id)
 
         if request.method == 'POST':
             serializer = SubscriptionSerializer(
@@ -149,66 +193,138 @@ class UserViewSet(DjoserUserViewSet):
         follow_instance.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False,
+            methods=['post', 'delete'],
+            url_path='subscribe/batch',
+            permission_classes=[permissions.IsAuthenticated]
+            )
+    def manage_subscription_batch(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        found = set(
+            User.objects.filter(pk__in=ids)
+            .exclude(pk=request.user.pk)
+            .values_list('pk', flat=True)
+        )
+        following_ids = [pk for pk in ids if pk in found]
+
+        if request.method == 'POST':
+            added = Follow.objects.follow_many(request.user.id, following_ids)
+            if added:
+                followed.send(
+                    sender=Follow, user_id=request.user.id,
+                    following_ids=added,
+                )
+            return batch_results(ids, found, added, ('added', 'exists'))
+        removed = Follow.objects.unfollow_many(
+            request.user.id, following_ids
+        )
+        if removed:
+            unfollowed.send(
+                sender=Follow, user_id=request.user.id, following_ids=removed
+            )
+        return batch_results(ids, found, removed, ('removed', 'missing'))
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all().select_related(
-        'author').prefetch_related('ingredients')
+    queryset = Recipe.objects.all()
     permission_classes = [
         permissions.IsAuthenticatedOrReadOnly,
         IsAuthorOrReadOnly
     ]
     pagination_class = Pagination
-    filter_backends = [DjangoFilterBackend]
+    cursor_ordering = ('-pub_date', '-id')
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = RecipeFilter
+    ordering_fields = ['pub_date', 'favorites_count', 'in_carts_count']
+
+    def get_queryset(self):
+        if self.action in ['list', 'retrieve']:
+            return Recipe.objects.for_read(self.request.user)
+        return super().get_queryset()
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return RecipeWriteSerializer
         return RecipeReadSerializer
 
-    @action(detail=False,
-            methods=['get'],
-            url_path='download_shopping_cart',
-            permission_classes=[permissions.IsAuthenticated]
+    def list(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return self.anonymous_list(request, *args, **kwargs)
+        # Общая версия списков меняется при любом изменении рецептов,
+        # их авторов, ингредиентов и счётчиков избранного и корзины,
+        # поэтому для ответа 304 запросы к базе не нужны.
+        return conditional_response(
+            request,
+            lambda: super(RecipeViewSet, self).list(request, *args, **kwargs),
+            f'recipes:{recipe_list_cache.get_version()}:'
+            f'{user_state_key(request.user)}:'
+            f'{recipe_list_cache.request_key(request)}',
+        )
+
+    def anonymous_list(self, request, *args, **kwargs):
+        version = recipe_list_cache.version(request)
+        params = recipe_list_cache.request_key(request)
+
+        def get_response():
+            data, served = recipe_list_cache.get_or_set(
+                request,
+                version,
+                lambda: super(RecipeViewSet, self).list(
+                    request, *args, **kwargs
+                ).data,
             )
-    def get_ingredients_list_from_cart(self, user):
-        ingredients = (
-            RecipeIngredient.objects
-            .filter(recipe__shopping_carts__user=user)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(amount=Sum('amount'))
-            .order_by('ingredient__name')
+            response = Response(data)
+            response.etag_key = f'recipes:{served}:{params}'
+            return response
+
+        return conditional_response(
+            request, get_response, f'recipes:{version}:{params}'
         )
 
-        ingredients_list = [
-            {
-                'name': ingredient['ingredient__name'],
-                'amount': ingredient['amount'],
-                'measurement_unit': ingredient['ingredient__measurement_unit']
-            }
-            for ingredient in ingredients
-        ]
+    def retrieve(self, request, *args, **kwargs):
+        versions = Recipe.objects.filter(
+            pk=kwargs[self.lookup_field]
+        ).values_list('updated_at', 'author__updated_at').first()
+        if versions is None:
+            return super().retrieve(request, *args, **kwargs)
+        return conditional_response(
+            request,
+            lambda: super(RecipeViewSet, self).retrieve(
+                request, *args, **kwargs
+            ),
+            f'recipe:{kwargs[self.lookup_field]}:{versions[0]}:'
+            f'{versions[1]}:{user_state_key(request.user)}',
+            self.last_modified(*versions),
+        )
 
-        return ingredients_list
+    def last_modified(self, *dates):
+        dates = [date for date in dates if date is not None]
+        state = getattr(self.request.user, 'state_updated_at', None)
+        if state is not None:
+            dates.append(state)
+        return max(dates, default=None)
 
     @action(detail=False,
             methods=['get'],
             url_path='download_shopping_cart',
-            permission_classes=[permissions.IsAuthenticated])
+            permission_classes=[permissions.IsAuthenticated],
+            renderer_classes=[TextShoppingListRenderer,
+                              CSVShoppingListRenderer,
+                              PDFShoppingListRenderer],
+            content_negotiation_class=ShoppingListNegotiation)
     def download_shopping_cart(self, request):
-        ingredients_list = self.get_ingredients_list_from_cart(request.user)
-        
-        content = "\n".join(
-            [
-                f"{ingredient['name']} ({ingredient['measurement_unit']}) — "
-                f"{ingredient['amount']}"
-                for ingredient in ingredients_list
-            ]
+        renderer = request.accepted_renderer
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type += f'; charset={renderer.charset}'
+        response = StreamingHttpResponse(
+            EXPORTS[renderer.format](shopping_cart_rows(request.user)),
+            content_type=content_type
         )
-        
-        response = HttpResponse(content, content_type="text/plain")
         response['Content-Disposition'] = (
-            'attachment; filename="shopping_cart.txt"'
+            f'attachment; filename="shopping_cart.{renderer.format}"'
         )
         return response
 
@@ -246,6 +362,97 @@ class RecipeViewSet(viewsets.ModelViewSet):
             FavoriteSerializer
         )
 
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite/batch',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def manage_favorite_batch(self, request):
+        return manage_user_recipes_batch(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart/batch',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def manage_shopping_cart_batch(self, request):
+        return manage_user_recipes_batch(request, ShoppingCart)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='feed',
+        permission_classes=[permissions.IsAuthenticated]
+    )
+    def feed(self, request):
+        page = self.paginate_queryset(Feed(request.user))
+        serializer = RecipeReadSerializer(
+            page, many=True, context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=True, methods=['get'], url_path='get-link')
+    def get_link(self, request, pk=None):
+        if not (pk.isdigit() and recipe_links.exists(int(pk))):
+            raise Http404
+        return Response({
+            'short-link': request.build_absolute_uri(
+                reverse('short-link', args=[encode(int(pk))])
+            )
+        })
+
+    @action(detail=False, methods=['get'], url_path='pantry')
+    def pantry(self, request):
+        serializer = PantrySerializer(data={
+            'ingredients': request.query_params.getlist('ingredients'),
+            **{
+                name: request.query_params[name]
+                for name in ('max_missing', 'limit')
+                if name in request.query_params
+            },
+        })
+        serializer.is_valid(raise_exception=True)
+        found = recipe_ingredient_index.cookable(
+            **serializer.validated_data
+        )
+        recipes = Recipe.objects.only(
+            'name', 'image', 'image_variants', 'cooking_time'
+        ).in_bulk([pk for pk, _ in found])
+        page = []
+        for pk, missing in found:
+            if pk in recipes:
+                recipes[pk].missing = missing
+                page.append(recipes[pk])
+        return Response(PantryRecipeSerializer(
+            page, many=True, context={'request': request}
+        ).data)
+
+    @action(detail=True, methods=['get'], url_path='similar')
+    def similar(self, request, pk=None):
+        limit = request.query_params.get('limit', '')
+        limit = (
+            min(int(limit), SIMILAR_RECIPES_MAX_LIMIT)
+            if limit.isdigit() and int(limit) > 0
+            else SIMILAR_RECIPES_LIMIT
+        )
+        ids = recipe_ingredient_index.similar(int(pk), limit) if (
+            pk.isdigit()
+        ) else None
+        if ids is None:
+            # Рецепт мог появиться после последнего обновления индекса.
+            get_object_or_404(Recipe, pk=pk)
+            ids = []
+        recipes = Recipe.objects.only(
+            'name', 'image', 'image_variants', 'cooking_time'
+        ).in_bulk(ids)
+        return Response(ShortRecipeSerializer(
+            [recipes[pk] for pk in ids if pk in recipes],
+            many=True,
+            context={'request': request},
+        ).data)
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
@@ -260,3 +467,40 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
         if name:
             queryset = queryset.filter(name__istartswith=name)
         return queryset
+
+    def list(self, request, *args, **kwargs):
+        if 'search' in request.query_params:
+            return super().list(request, *args, **kwargs)
+        name = request.query_params.get('name', '')
+        # Без name — весь справочник, как и без индекса
+        # (см. IngredientIndex.search); с name — не больше
+        # INGREDIENT_SEARCH_LIMIT.
+        return conditional_response(
+            request,
+            lambda: HttpResponse(
+                ingredient_index.search(name, INGREDIENT_SEARCH_LIMIT),
+                content_type='application/json'
+            ),
+            f'ingredients:{ingredient_index.version()}:{name}',
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional_response(
+            request,
+            lambda: super(IngredientViewSet, self).retrieve(
+                request, *args, **kwargs
+            ),
+            f'ingredient:{ingredient_index.version()}:{kwargs["pk"]}',
+        )
+
+
+def short_link_redirect(request, code):
+    """Переход по короткой ссылке на страницу рецепта.
+
+    Существование рецепта проверяется через кэши recipe_links, поэтому
+    повторные переходы не обращаются к базе.
+    """
+    pk = decode(code)
+    if pk is None or not recipe_links.exists(pk):
+        raise Http404
+    return HttpResponseRedirect(f'/recipes/{pk}')
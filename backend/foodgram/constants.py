@@ -18,3 +18,70 @@ BASE62_ALPHABET = (
 )
 
 BASE62_DIVIDER = 62
+
+SHORT_LINK_MAX_LENGTH = 11
+
+SHORT_LINK_LRU_SIZE = 10000
+
+SHORT_LINK_LOCAL_TIMEOUT = 60
+
+SHORT_LINK_CACHE_TIMEOUT = 60 * 60 * 24
+
+SHORT_LINK_MISS_TIMEOUT = 60
+
+INGREDIENT_SEARCH_LIMIT = 50
+
+SIMILAR_RECIPES_LIMIT = 6
+
+SIMILAR_RECIPES_MAX_LIMIT = 50
+
+SIMILAR_INDEX_SYNC_OVERLAP = 60
+
+PANTRY_RECIPES_LIMIT = 20
+
+PANTRY_RECIPES_MAX_LIMIT = 100
+
+MAX_PANTRY_INGREDIENTS = 100
+
+SEARCH_CONFIG = 'russian'
+
+IMAGE_VARIANT_SIZES = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'detail': (1200, 1200),
+}
+
+IMAGE_VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+
+BASE64_DECODE_CHUNK = 64 * 1024
+
+MAX_LENGTH_MEDIA_FILE_NAME = 255
+
+MEDIA_HASH_PREFIX_LENGTH = 2
+
+MAX_LENGTH_JOB_NAME = 255
+
+MAX_LENGTH_JOB_WORKER = 128
+
+JOB_MAX_ATTEMPTS = 5
+
+JOB_BACKOFF_SECONDS = 10
+
+JOB_MAX_BACKOFF_SECONDS = 60 * 60
+
+MAX_LENGTH_DATA_FILE_NAME = 255
+
+CHECKSUM_LENGTH = 64
+
+MAX_BATCH_SIZE = 100
+
+FEED_INBOX_LIMIT = 500
+
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+
+FEED_FANOUT_BATCH_SIZE = 1000
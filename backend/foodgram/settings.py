@@ -35,6 +35,19 @@ else:
         }
     }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+RECIPE_CACHE_ALIAS = 'default'
+
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 300))
+
 INSTALLED_APPS = [
     'django.contrib.admin',
     'django.contrib.auth',
@@ -42,12 +55,14 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
     'users',
     'recipes',
     'api',
+    'jobs',
 ]
 
 MIDDLEWARE = [
@@ -103,10 +118,34 @@ USE_I18N = True
 
 USE_TZ = True
 
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / 'media'
 
+STORAGES = {
+    'default': {
+        'BACKEND': 'recipes.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False').lower() == 'true'
+JOBS_CONCURRENCY = int(os.getenv('JOBS_CONCURRENCY', 2))
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 1))
+JOBS_STALE_TIMEOUT = int(os.getenv('JOBS_STALE_TIMEOUT', 15 * 60))
+JOBS_HOUSEKEEPING_INTERVAL = 60
+JOBS_KEEP_DONE_DAYS = 7
+
+PDF_FONT_PATH = os.getenv(
+    'PDF_FONT_PATH', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'static'
 
@@ -0,0 +1,13 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'name', 'status', 'attempts', 'run_at', 'duration', 'worker'
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'duration')
@@ -0,0 +1,140 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.models import Job
+from jobs.queue import execute
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.JOBS_CONCURRENCY,
+            help='Сколько задач выполнять одновременно.',
+        )
+        parser.add_argument(
+            '--pool',
+            choices=('thread', 'process'),
+            default='thread',
+            help='Пул потоков или процессов.',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.JOBS_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, с.',
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Выйти, когда очередь опустеет.',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Показать статистику по задачам и выйти.',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            return self.print_stats()
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        concurrency = options['concurrency']
+        if options['pool'] == 'process':
+            # Потомки запускаются заново, а не через fork, чтобы не
+            # наследовать соединения с базой родителя.
+            pool = ProcessPoolExecutor(
+                concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        else:
+            pool = ThreadPoolExecutor(concurrency, thread_name_prefix='job')
+        self.stdout.write(
+            f'Воркер {worker}: {options["pool"]} x {concurrency}'
+        )
+
+        running = {}
+        housekeeping = 0
+        try:
+            while not self.stopping:
+                if time.monotonic() >= housekeeping:
+                    self.housekeeping()
+                    housekeeping = time.monotonic() + (
+                        settings.JOBS_HOUSEKEEPING_INTERVAL
+                    )
+                free = concurrency - len(running)
+                claimed = (
+                    Job.objects.claim(free, worker) if free else []
+                )
+                for task in claimed:
+                    running[pool.submit(execute, task.pk)] = task
+                if not running:
+                    if options['burst']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                done, _ = wait(
+                    running,
+                    timeout=options['poll_interval'],
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in done:
+                    self.report(running.pop(future), future)
+        finally:
+            for future in wait(running).done:
+                self.report(running.pop(future), future)
+            pool.shutdown()
+            connections.close_all()
+
+    def stop(self, signum, frame):
+        self.stdout.write('Завершаем начатые задачи...')
+        self.stopping = True
+
+    def housekeeping(self):
+        requeued = Job.objects.requeue_stale(settings.JOBS_STALE_TIMEOUT)
+        if requeued:
+            self.stderr.write(f'Возвращено в очередь зависших: {requeued}')
+        Job.objects.prune(settings.JOBS_KEEP_DONE_DAYS)
+
+    def report(self, task, future):
+        try:
+            status, duration = future.result()
+        except Exception as error:
+            self.stderr.write(f'{task.name} #{task.pk}: {error!r}')
+            return
+        if self.verbosity > 1 or status != Job.Status.DONE:
+            self.stdout.write(
+                f'{task.name} #{task.pk}: {status} за {duration:.3f} с'
+            )
+
+    def execute(self, *args, **options):
+        self.verbosity = options.get('verbosity', 1)
+        return super().execute(*args, **options)
+
+    def print_stats(self):
+        for row in Job.objects.stats():
+            self.stdout.write(
+                f'{row["name"]}: всего {row["total"]}, '
+                f'в очереди {row["queued"]}, ошибок {row["failed"]}, '
+                f'повторов {row["retries"] or 0}, '
+                f'среднее {row["avg_duration"] or 0:.3f} с, '
+                f'максимум {row["max_duration"] or 0:.3f} с'
+            )
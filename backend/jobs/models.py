@@ -0,0 +1,167 @@
+from datetime import timedelta
+
+from django.db import connection, models, transaction
+from django.db.models import Avg, Count, F, Max, Q, Sum
+from django.utils import timezone
+
+from foodgram.constants import MAX_LENGTH_JOB_NAME, MAX_LENGTH_JOB_WORKER
+
+
+class JobQuerySet(models.QuerySet):
+
+    def due(self):
+        return self.filter(
+            status=Job.Status.QUEUED, run_at__lte=timezone.now()
+        ).order_by('run_at', 'id')
+
+    def claim(self, limit, worker):
+        """Забирает до limit готовых к запуску задач для воркера worker.
+
+        На PostgreSQL строки блокируются через SELECT ... FOR UPDATE
+        SKIP LOCKED, и воркеры не ждут друг друга. На базах без SKIP
+        LOCKED задача достаётся тому, чей UPDATE со статусом в условии
+        сработал первым.
+        """
+        now = timezone.now()
+        claimed = dict(
+            status=Job.Status.RUNNING,
+            worker=worker,
+            started_at=now,
+            attempts=F('attempts') + 1,
+        )
+        if connection.features.has_select_for_update_skip_locked:
+            with transaction.atomic():
+                ids = list(
+                    self.due().select_for_update(skip_locked=True)
+                    .values_list('id', flat=True)[:limit]
+                )
+                self.filter(id__in=ids).update(**claimed)
+        else:
+            ids = [
+                job_id
+                for job_id in self.due().values_list('id', flat=True)[:limit]
+                if self.filter(id=job_id, status=Job.Status.QUEUED)
+                .update(**claimed)
+            ]
+        return list(self.filter(id__in=ids).order_by('run_at', 'id'))
+
+    def requeue_stale(self, timeout):
+        """Возвращает в очередь задачи упавших воркеров."""
+        return self.filter(
+            status=Job.Status.RUNNING,
+            started_at__lt=timezone.now() - timedelta(seconds=timeout),
+        ).update(status=Job.Status.QUEUED, worker='')
+
+    def prune(self, days):
+        return self.filter(
+            status=Job.Status.DONE,
+            finished_at__lt=timezone.now() - timedelta(days=days),
+        ).delete()[0]
+
+    def stats(self):
+        """Число запусков и время выполнения по именам задач."""
+        return (
+            self.values('name')
+            .annotate(
+                total=Count('id'),
+                queued=Count('id', filter=Q(status=Job.Status.QUEUED)),
+                failed=Count('id', filter=Q(status=Job.Status.FAILED)),
+                retries=(
+                    Sum('attempts') - Count('id', filter=Q(attempts__gt=0))
+                ),
+                avg_duration=Avg('duration'),
+                max_duration=Max('duration'),
+            )
+            .order_by('name')
+        )
+
+
+class Job(models.Model):
+    """Задача фоновой очереди.
+
+    name — путь к функции с декоратором @job, args и kwargs — её
+    аргументы. Задачи выполняет команда runworker.
+    """
+
+    class Status(models.TextChoices):
+        QUEUED = 'queued', 'В очереди'
+        RUNNING = 'running', 'Выполняется'
+        DONE = 'done', 'Выполнена'
+        FAILED = 'failed', 'Ошибка'
+
+    name = models.CharField(
+        max_length=MAX_LENGTH_JOB_NAME,
+        verbose_name='Задача',
+    )
+    args = models.JSONField(
+        default=list,
+        verbose_name='Аргументы',
+    )
+    kwargs = models.JSONField(
+        default=dict,
+        verbose_name='Именованные аргументы',
+    )
+    status = models.CharField(
+        max_length=max(len(value) for value in Status.values),
+        choices=Status.choices,
+        default=Status.QUEUED,
+        verbose_name='Статус',
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Попытки',
+    )
+    max_attempts = models.PositiveIntegerField(
+        verbose_name='Максимум попыток',
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Запустить после',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана',
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Начата',
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Завершена',
+    )
+    duration = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Время выполнения, с',
+    )
+    worker = models.CharField(
+        max_length=MAX_LENGTH_JOB_WORKER,
+        blank=True,
+        verbose_name='Воркер',
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка',
+    )
+
+    objects = JobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['run_at', 'id'],
+                condition=Q(status='queued'),
+                name='job_queued_run_at',
+            ),
+            models.Index(fields=['status', 'started_at'],
+                         name='job_status_started_at'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.get_status_display()})'
@@ -0,0 +1,94 @@
+import logging
+import time
+import traceback
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from foodgram.constants import (JOB_BACKOFF_SECONDS, JOB_MAX_ATTEMPTS,
+                                JOB_MAX_BACKOFF_SECONDS)
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+
+def job(func=None, *, max_attempts=JOB_MAX_ATTEMPTS):
+    """Делает функцию фоновой задачей.
+
+    Вызов func(...) по-прежнему выполняет её сразу, а func.delay(...)
+    ставит в очередь. Аргументы должны сериализоваться в JSON. Строка
+    задачи пишется в текущей транзакции, поэтому воркер увидит её
+    только вместе с данными, ради которых она поставлена.
+    """
+    if func is None:
+        return lambda func: job(func, max_attempts=max_attempts)
+
+    name = f'{func.__module__}.{func.__qualname__}'
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+
+    def delay(*args, **kwargs):
+        if settings.JOBS_EAGER:
+            transaction.on_commit(lambda: func(*args, **kwargs))
+            return None
+        return Job.objects.create(
+            name=name, args=list(args), kwargs=kwargs,
+            max_attempts=max_attempts,
+        )
+
+    wrapper.delay = delay
+    wrapper.job_name = name
+    return wrapper
+
+
+def backoff(attempts):
+    return min(
+        JOB_BACKOFF_SECONDS * 2 ** (attempts - 1), JOB_MAX_BACKOFF_SECONDS
+    )
+
+
+def execute(job_id):
+    """Выполняет взятую воркером задачу и записывает результат."""
+    close_old_connections()
+    task = Job.objects.get(pk=job_id)
+    started = time.perf_counter()
+    try:
+        func = import_string(task.name)
+        if not hasattr(func, 'delay'):
+            raise ImportError(f'{task.name} не объявлена через @job.')
+        func(*task.args, **task.kwargs)
+    except Exception:
+        task.duration = time.perf_counter() - started
+        task.last_error = traceback.format_exc()
+        task.finished_at = timezone.now()
+        if task.attempts < task.max_attempts:
+            task.status = Job.Status.QUEUED
+            task.run_at = task.finished_at + timedelta(
+                seconds=backoff(task.attempts)
+            )
+        else:
+            task.status = Job.Status.FAILED
+        logger.warning(
+            'Задача %s #%s, попытка %s из %s: ошибка за %.3f с',
+            task.name, task.pk, task.attempts, task.max_attempts,
+            task.duration, exc_info=True,
+        )
+    else:
+        task.duration = time.perf_counter() - started
+        task.finished_at = timezone.now()
+        task.status = Job.Status.DONE
+        logger.info(
+            'Задача %s #%s выполнена за %.3f с',
+            task.name, task.pk, task.duration,
+        )
+    task.save(update_fields=[
+        'status', 'run_at', 'finished_at', 'duration', 'last_error',
+    ])
+    close_old_connections()
+    return task.status, task.duration
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
-from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart)
+from .models import (DataFile, Favorite, Ingredient, MediaFile, Recipe,
+                     RecipeIngredient, ShoppingCart, ShoppingListItem)
 
 
 class RecipeIngredientInline(admin.TabularInline):
@@ -14,13 +14,30 @@ class RecipeIngredientInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author', 'cooking_time', 'favorites_count')
+    list_display = (
+        'name', 'author', 'cooking_time', 'favorites_count', 'in_carts_count'
+    )
     search_fields = ('name', 'author__username')
+    list_select_related = ('author',)
     inlines = [RecipeIngredientInline]
 
-    @admin.display(description="Добавлений в избранное")
-    def favorites_count(self, obj):
-        return obj.favorites.count()
+    def save_model(self, request, obj, form, change):
+        old_image = (
+            Recipe.objects.filter(pk=obj.pk).values_list(
+                'image', flat=True
+            ).first()
+            if change else None
+        )
+        super().save_model(request, obj, form, change)
+        if old_image and 'image' in form.changed_data:
+            # Как в RecipeWriteSerializer.update: новая картинка уже
+            # получила свою ссылку, даже если это тот же файл.
+            obj.image.storage.delete(old_image)
+
+    def save_related(self, request, form, formsets, change):
+        old_amounts = form.instance.ingredient_amounts() if change else {}
+        super().save_related(request, form, formsets, change)
+        form.instance.update_shopping_lists(old_amounts)
 
 
 @admin.register(Ingredient)
@@ -40,9 +57,37 @@ class RecipeIngredientAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
     search_fields = ('recipe__name', 'ingredient__name')
 
+    def save_model(self, request, obj, form, change):
+        old_amounts = obj.recipe.ingredient_amounts()
+        super().save_model(request, obj, form, change)
+        obj.recipe.update_shopping_lists(old_amounts)
+
+    def delete_model(self, request, obj):
+        old_amounts = obj.recipe.ingredient_amounts()
+        super().delete_model(request, obj)
+        obj.recipe.update_shopping_lists(old_amounts)
+
 
 @admin.register(ShoppingCart)
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
     search_fields = ('user__username', 'recipe__name')
     list_filter = ('user',)
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    search_fields = ('user__username', 'ingredient__name')
+    raw_id_fields = ('user', 'ingredient')
+
+
+@admin.register(MediaFile)
+class MediaFileAdmin(admin.ModelAdmin):
+    list_display = ('name', 'refs')
+    search_fields = ('name',)
+
+
+@admin.register(DataFile)
+class DataFileAdmin(admin.ModelAdmin):
+    list_display = ('name', 'checksum', 'loaded_at')
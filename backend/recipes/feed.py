@@ -0,0 +1,142 @@
+from django.db.models import Q
+
+from foodgram.constants import (FEED_FANOUT_BATCH_SIZE,
+                                FEED_FANOUT_MAX_FOLLOWERS, FEED_INBOX_LIMIT)
+from jobs.queue import job
+from recipes.models import FeedEntry, Recipe
+from users.models import Follow
+
+
+def deliver(recipes, user_ids):
+    """Кладёт рецепты во входящие пользователей и обрезает их."""
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe.pk,
+                author_id=recipe.author_id,
+                pub_date=recipe.pub_date,
+            )
+            for user_id in user_ids
+            for recipe in recipes
+        ],
+        batch_size=FEED_FANOUT_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    FeedEntry.objects.trim(user_ids)
+
+
+@job
+def fan_out_recipe(recipe_id):
+    """Рассылает новый рецепт во входящие подписчиков автора.
+
+    Рецепты авторов, у которых больше FEED_FANOUT_MAX_FOLLOWERS
+    подписчиков, не рассылаются: Feed читает их из таблицы рецептов.
+    """
+    recipe = Recipe.objects.select_related('author').only(
+        'pub_date', 'author__followers_count'
+    ).filter(pk=recipe_id).first()
+    if (
+        recipe is None
+        or recipe.author.followers_count > FEED_FANOUT_MAX_FOLLOWERS
+    ):
+        return
+    followers = Follow.objects.filter(
+        following_id=recipe.author_id
+    ).order_by('user_id').values_list('user_id', flat=True)
+    last = 0
+    while True:
+        user_ids = list(
+            followers.filter(user_id__gt=last)[:FEED_FANOUT_BATCH_SIZE]
+        )
+        if not user_ids:
+            break
+        deliver([recipe], user_ids)
+        last = user_ids[-1]
+
+
+@job
+def backfill_feed(user_id, author_ids):
+    """Переносит во входящие подписчика последние рецепты авторов."""
+    # Пока задача ждала в очереди, от автора могли отписаться.
+    author_ids = list(
+        Follow.objects.filter(
+            user_id=user_id,
+            following_id__in=author_ids,
+            following__followers_count__lte=FEED_FANOUT_MAX_FOLLOWERS,
+        ).values_list('following_id', flat=True)
+    )
+    if not author_ids:
+        return
+    latest = Recipe.objects.only('author', 'pub_date').latest_by_author(
+        author_ids, FEED_INBOX_LIMIT
+    )
+    deliver(
+        [recipe for recipes in latest.values() for recipe in recipes],
+        [user_id],
+    )
+
+
+def remove_authors(user_id, author_ids):
+    """Убирает из входящих подписчика рецепты авторов."""
+    FeedEntry.objects.filter(
+        user_id=user_id, author_id__in=author_ids
+    ).delete()
+
+
+class Feed:
+    """Лента рецептов авторов, на которых подписан пользователь.
+
+    Рецепты обычных авторов лежат во входящих FeedEntry, рецепты
+    авторов без рассылки читаются из Recipe; ключи (pub_date, id) двух
+    источников сливаются, и только затем загружаются сами рецепты.
+    Листается только по ключу, через keyset_page.
+    """
+
+    model = Recipe
+
+    def __init__(self, user):
+        self.user = user
+
+    def keyset_page(self, ordering, position, limit):
+        """limit рецептов строго после position.
+
+        ordering — ('-pub_date', '-id') или обратный ему при переходе
+        на предыдущую страницу.
+        """
+        descending = ordering[0].startswith('-')
+        keys = set(self.keys(
+            FeedEntry.objects.filter(user=self.user),
+            'recipe_id', descending, position, limit,
+        ))
+        popular = list(
+            Follow.objects.filter(
+                user=self.user,
+                following__followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS,
+            ).values_list('following_id', flat=True)
+        )
+        if popular:
+            keys.update(self.keys(
+                Recipe.objects.filter(author_id__in=popular),
+                'id', descending, position, limit,
+            ))
+        keys = sorted(keys, reverse=descending)[:limit]
+        recipes = Recipe.objects.for_read(self.user).in_bulk(
+            [pk for _, pk in keys]
+        )
+        return [recipes[pk] for _, pk in keys if pk in recipes]
+
+    @staticmethod
+    def keys(queryset, id_field, descending, position, limit):
+        sign, lookup = ('-', 'lt') if descending else ('', 'gt')
+        if position is not None:
+            queryset = queryset.filter(
+                Q(**{f'pub_date__{lookup}': position['pub_date']})
+                | Q(
+                    pub_date=position['pub_date'],
+                    **{f'{id_field}__{lookup}': position['id']},
+                )
+            )
+        return queryset.order_by(
+            f'{sign}pub_date', f'{sign}{id_field}'
+        ).values_list('pub_date', id_field)[:limit]
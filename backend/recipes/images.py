@@ -0,0 +1,104 @@
+import posixpath
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from foodgram.constants import IMAGE_VARIANT_FORMATS, IMAGE_VARIANT_SIZES
+from jobs.queue import job
+
+
+def make_variants(field_file):
+    """Сохраняет уменьшенные копии картинки во всех размерах и форматах.
+
+    Возвращает словарь {'source': исходный файл,
+    размер: {формат: файл}} для поля *_variants модели.
+    """
+    storage = field_file.storage
+    directory = posixpath.join(field_file.field.upload_to, 'variants')
+    with storage.open(field_file.name) as source:
+        original = ImageOps.exif_transpose(Image.open(source))
+        original.load()
+    variants = {'source': field_file.name}
+    for size, box in IMAGE_VARIANT_SIZES.items():
+        image = original.copy()
+        image.thumbnail(box, Image.LANCZOS)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.mode else 'RGB')
+        variants[size] = {}
+        for extension, (image_format, options) in (
+            IMAGE_VARIANT_FORMATS.items()
+        ):
+            converted = image
+            if image_format == 'JPEG' and image.mode != 'RGB':
+                converted = image.convert('RGB')
+            buffer = BytesIO()
+            converted.save(buffer, image_format, **options)
+            variants[size][extension] = storage.save(
+                posixpath.join(directory, f'{size}.{extension}'),
+                ContentFile(buffer.getvalue()),
+            )
+    return variants
+
+
+@job
+def build_variants(label, pk, field_name, variants_field):
+    model = apps.get_model(label)
+    instance = model.objects.filter(pk=pk).first()
+    field_file = getattr(instance, field_name, None)
+    variants = getattr(instance, variants_field, None) or {}
+    # Задачу могли поставить дважды, а картинку — успеть удалить.
+    if not field_file or variants.get('source') == field_file.name:
+        return
+    variants = make_variants(field_file)
+    with transaction.atomic():
+        instance = model.objects.select_for_update().filter(pk=pk).first()
+        # Картинку могли заменить, пока строились копии.
+        if instance and getattr(instance, field_name).name == (
+            variants['source']
+        ):
+            outdated = getattr(instance, variants_field)
+            setattr(instance, variants_field, variants)
+            instance.save(update_fields=[variants_field, 'updated_at'])
+        else:
+            outdated = variants
+        for name in variant_names(outdated):
+            field_file.storage.delete(name)
+
+
+def image_fields():
+    """Модели с картинками: (модель, поле картинки, поле копий)."""
+    return [
+        (apps.get_model('recipes', 'Recipe'), 'image', 'image_variants'),
+        (apps.get_model(settings.AUTH_USER_MODEL), 'avatar',
+         'avatar_variants'),
+    ]
+
+
+def variant_names(variants):
+    for size, files in (variants or {}).items():
+        if size != 'source':
+            yield from files.values()
+
+
+def release_image(field_file, variants=None):
+    """Снимает ссылки на картинку и её копии в хранилище."""
+    if not field_file:
+        return
+    for name in variant_names(variants):
+        field_file.storage.delete(name)
+    field_file.storage.delete(field_file.name)
+
+
+def schedule_variants(instance, field_name, variants_field):
+    """Ставит построение копий в фоновую очередь."""
+    field_file = getattr(instance, field_name)
+    variants = getattr(instance, variants_field) or {}
+    if not field_file or variants.get('source') == field_file.name:
+        return
+    build_variants.delay(
+        instance._meta.label, instance.pk, field_name, variants_field
+    )
@@ -0,0 +1,149 @@
+import csv
+import hashlib
+import json
+import os
+
+from django.core.management.color import no_style
+from django.db import connection
+
+from recipes.models import Ingredient
+
+CHUNK_SIZE = 64 * 1024
+
+JSON_SPACE = ' \t\r\n'
+
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_json_array(file):
+    """Элементы JSON-массива верхнего уровня по одному.
+
+    Файл читается порциями по CHUNK_SIZE символов, поэтому в памяти
+    одновременно только порция и разбираемый элемент, а не весь файл.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = '', 0, False
+
+    def next_char():
+        # Следующий значимый символ; дочитывает файл по необходимости.
+        nonlocal buffer, position, eof
+        while True:
+            while position < len(buffer) and buffer[position] in JSON_SPACE:
+                position += 1
+            if position < len(buffer) or eof:
+                return buffer[position:position + 1]
+            buffer, position = file.read(CHUNK_SIZE), 0
+            eof = not buffer
+
+    if next_char() != '[':
+        raise ValueError('Ожидался JSON-массив.')
+    position += 1
+    while True:
+        char = next_char()
+        if char == ',':
+            position += 1
+            continue
+        if char == ']':
+            return
+        if not char:
+            raise ValueError('JSON-массив не закрыт.')
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            item, end = None, None
+        # Элемент мог оборваться на границе порции: «4.» в «4.5», «tr»
+        # в «true». Он цел, только если за ним уже виден разделитель.
+        if not eof and (
+            end is None
+            or end == len(buffer)
+            or buffer[end] not in JSON_SPACE + ',]'
+        ):
+            chunk = file.read(CHUNK_SIZE)
+            buffer, position = buffer[position:] + chunk, 0
+            eof = not chunk
+            continue
+        if end is None:
+            raise ValueError('Некорректный элемент JSON-массива.')
+        yield item
+        position = end
+
+
+def read_ingredients(path):
+    """Поток Ingredient из CSV (название, единица) или фикстуры JSON.
+
+    Оба формата читаются потоком. В фикстуре сохраняются первичные
+    ключи: на них ссылаются рецепты из recipes.json.
+    """
+    if os.path.splitext(path)[1].lower() == '.csv':
+        with open(path, encoding='utf-8', newline='') as file:
+            for name, measurement_unit in csv.reader(file):
+                yield Ingredient(
+                    name=name.strip(),
+                    measurement_unit=measurement_unit.strip(),
+                )
+        return
+    with open(path, encoding='utf-8') as file:
+        for row in iter_json_array(file):
+            if 'fields' in row:
+                yield Ingredient(pk=row.get('pk'), **row['fields'])
+            else:
+                yield Ingredient(
+                    name=row['name'],
+                    measurement_unit=row['measurement_unit'],
+                )
+
+
+def upsert_ingredients(ingredients, batch_size):
+    """Вставляет и обновляет ингредиенты пачками по batch_size строк.
+
+    Ингредиенты сопоставляются по уникальному названию. Первичный ключ
+    из фикстуры сохраняется у новых ингредиентов, если он свободен.
+    Возвращает число обработанных строк.
+    """
+    total = 0
+    batch = {}
+    for ingredient in ingredients:
+        # Повтор названия в одной пачке PostgreSQL не обновит дважды.
+        batch[ingredient.name] = ingredient
+        if len(batch) >= batch_size:
+            total += flush(list(batch.values()))
+            batch.clear()
+    total += flush(list(batch.values()))
+    reset_sequences()
+    return total
+
+
+def flush(batch):
+    if not batch:
+        return 0
+    taken = dict(
+        Ingredient.objects.filter(
+            pk__in=[ingredient.pk for ingredient in batch if ingredient.pk]
+        ).values_list('pk', 'name')
+    )
+    for ingredient in batch:
+        # Чужой id не отнимаем: ингредиент получит новый.
+        if taken.get(ingredient.pk, ingredient.name) != ingredient.name:
+            ingredient.pk = None
+    Ingredient.objects.bulk_create(
+        batch,
+        update_conflicts=True,
+        unique_fields=['name'],
+        update_fields=['measurement_unit'],
+    )
+    return len(batch)
+
+
+def reset_sequences():
+    # После вставки с явными id последовательность PostgreSQL отстаёт.
+    statements = connection.ops.sequence_reset_sql(no_style(), [Ingredient])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from recipes.images import image_fields, make_variants, variant_names
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит уменьшенные копии картинок рецептов и аватаров, '
+        'у которых их ещё нет или они устарели.'
+    )
+
+    def handle(self, *args, **options):
+        for model, field_name, variants_field in image_fields():
+            built = failed = 0
+            rows = model.objects.exclude(**{field_name: ''}).exclude(
+                **{f'{field_name}__isnull': True}
+            ).only('pk', field_name, variants_field, 'updated_at')
+            for instance in rows.iterator():
+                field_file = getattr(instance, field_name)
+                variants = getattr(instance, variants_field) or {}
+                if variants.get('source') == field_file.name:
+                    continue
+                try:
+                    new_variants = make_variants(field_file)
+                except (OSError, ValueError) as error:
+                    failed += 1
+                    self.stderr.write(f'{field_file.name}: {error}')
+                    continue
+                setattr(instance, variants_field, new_variants)
+                instance.save(update_fields=[variants_field, 'updated_at'])
+                for name in variant_names(variants):
+                    field_file.storage.delete(name)
+                built += 1
+            self.stdout.write(
+                f'{model._meta.label}.{field_name}: построено {built}, '
+                f'ошибок {failed}'
+            )
@@ -0,0 +1,90 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from recipes.models import RecipeIngredient, ShoppingListItem
+
+
+def expected_totals(users=None):
+    recipe_ingredients = RecipeIngredient.objects.filter(
+        recipe__shopping_carts__isnull=False
+    )
+    if users is not None:
+        recipe_ingredients = RecipeIngredient.objects.filter(
+            recipe__shopping_carts__user__in=users
+        )
+    return (
+        recipe_ingredients
+        .values_list('recipe__shopping_carts__user', 'ingredient')
+        .annotate(total=Sum('amount'))
+        .order_by('recipe__shopping_carts__user', 'ingredient')
+    )
+
+
+def merge(expected, stored):
+    """Сравнивает два потока (user_id, ingredient_id, amount).
+
+    Оба потока отсортированы по (user_id, ingredient_id), поэтому
+    сравнение идёт за один проход без загрузки данных в память.
+    Возвращает тройки (ключ, ожидаемое, сохранённое) для расхождений.
+    """
+    expected, stored = iter(expected), iter(stored)
+    left, right = next(expected, None), next(stored, None)
+    while left is not None or right is not None:
+        if right is None or (left is not None and left[:2] < right[:2]):
+            yield left[:2], left[2], None
+            left = next(expected, None)
+        elif left is None or right[:2] < left[:2]:
+            yield right[:2], None, right[2]
+            right = next(stored, None)
+        else:
+            if left[2] != right[2]:
+                yield left[:2], left[2], right[2]
+            left, right = next(expected, None), next(stored, None)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает сохранённые списки покупок с суммами по рецептам '
+        'из корзин и при необходимости исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair', action='store_true',
+            help='Пересчитать списки покупок пользователей с расхождениями.',
+        )
+
+    def handle(self, *args, **options):
+        stored = (
+            ShoppingListItem.objects
+            .values_list('user', 'ingredient', 'amount')
+            .order_by('user', 'ingredient')
+        )
+        users = set()
+        for (user_id, ingredient_id), should_be, actual in merge(
+            expected_totals().iterator(), stored.iterator()
+        ):
+            users.add(user_id)
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'ожидалось {should_be}, сохранено {actual}'
+            )
+        self.stdout.write(f'Пользователей с расхождениями: {len(users)}')
+        if users and options['repair']:
+            self.repair(users)
+            self.stdout.write(self.style.SUCCESS('Списки покупок исправлены.'))
+
+    @transaction.atomic
+    def repair(self, users):
+        ShoppingListItem.objects.filter(user__in=users).delete()
+        ShoppingListItem.objects.bulk_create(
+            (
+                ShoppingListItem(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=total
+                )
+                for user_id, ingredient_id, total
+                in expected_totals(users).iterator()
+            ),
+            batch_size=1000,
+        )
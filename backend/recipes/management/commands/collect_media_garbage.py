@@ -0,0 +1,156 @@
+import hashlib
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recipes.images import image_fields, variant_names
+from recipes.models import MediaFile
+
+
+def fingerprint(name):
+    """Короткий отпечаток пути для множества ссылок.
+
+    Восемь байт вместо строки пути; случайное совпадение отпечатков
+    только оставит лишний файл на диске.
+    """
+    return hashlib.blake2b(name.encode(), digest_size=8).digest()
+
+
+def referenced_names():
+    """Поток имён файлов, на которые ссылаются картинки и их копии."""
+    for model, field_name, variants_field in image_fields():
+        rows = (
+            model.objects.exclude(**{field_name: ''})
+            .exclude(**{f'{field_name}__isnull': True})
+            .values_list(field_name, variants_field)
+        )
+        for name, variants in rows.iterator():
+            yield name
+            yield from variant_names(variants)
+
+
+def still_referenced(names):
+    """Имена из names, которые стали картинками после начала сборки."""
+    found = set()
+    for model, field_name, _ in image_fields():
+        found.update(
+            model.objects.filter(**{f'{field_name}__in': names})
+            .values_list(field_name, flat=True)
+        )
+    return found
+
+
+def scan(root, skip):
+    """Обходит каталог через os.scandir, не собирая список файлов."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.path != skip:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из MEDIA_ROOT файлы, на которые не ссылается ни один '
+        'рецепт или пользователь.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет удалено.',
+        )
+        parser.add_argument(
+            '--quarantine',
+            help='Переносить файлы в этот каталог вместо удаления.',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=float,
+            default=24,
+            help='Не трогать файлы моложе этого числа часов.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+        )
+
+    def handle(self, *args, **options):
+        root = os.path.abspath(settings.MEDIA_ROOT)
+        quarantine = options['quarantine']
+        if quarantine:
+            quarantine = os.path.abspath(quarantine)
+        # Файлы новее этой отметки могли загрузить, пока читались ссылки.
+        newest = time.time() - options['min_age'] * 3600
+        referenced = {fingerprint(name) for name in referenced_names()}
+        self.stdout.write(f'Файлов со ссылками: {len(referenced)}')
+
+        totals = [0, 0, 0]
+        batch = []
+        for entry in scan(root, quarantine):
+            name = os.path.relpath(entry.path, root).replace(os.sep, '/')
+            if fingerprint(name) in referenced:
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > newest:
+                continue
+            batch.append((name, stat.st_size))
+            if len(batch) >= options['batch_size']:
+                self.collect(root, batch, options, totals)
+                batch = []
+        if batch:
+            self.collect(root, batch, options, totals)
+        found, size, kept = totals
+
+        action = (
+            'будет удалено' if options['dry_run']
+            else 'перенесено' if quarantine else 'удалено'
+        )
+        self.stdout.write(
+            f'Файлов без ссылок {action}: {found} '
+            f'({size / (1024 * 1024):.1f} МБ)'
+        )
+        if kept:
+            self.stdout.write(f'Оставлено, ссылки появились: {kept}')
+
+    def collect(self, root, batch, options, totals):
+        """Удаляет пачку файлов.
+
+        totals — [удалено файлов, удалено байт, оставлено файлов].
+        """
+        alive = still_referenced([name for name, _ in batch])
+        batch = [(name, size) for name, size in batch if name not in alive]
+        totals[2] += len(alive)
+        for name, _ in batch:
+            if options['verbosity'] > 1 or options['dry_run']:
+                self.stdout.write(name)
+        if options['dry_run']:
+            totals[0] += len(batch)
+            totals[1] += sum(size for _, size in batch)
+            return
+
+        removed = []
+        for name, size in batch:
+            path = os.path.join(root, name)
+            try:
+                if options['quarantine']:
+                    target = os.path.join(options['quarantine'], name)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(path, target)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                continue
+            removed.append(name)
+            totals[0] += 1
+            totals[1] += size
+        MediaFile.objects.filter(name__in=removed).delete()
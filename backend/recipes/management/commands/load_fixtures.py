@@ -0,0 +1,29 @@
+import os
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.loaders import file_checksum
+from recipes.models import DataFile
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет loaddata только для фикстур, которые изменились '
+        'с прошлой загрузки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixtures', nargs='+')
+
+    def handle(self, *args, **options):
+        for path in options['fixtures']:
+            name = os.path.basename(path)
+            checksum = file_checksum(path)
+            if DataFile.objects.is_loaded(name, checksum):
+                self.stdout.write(f'{name} не изменился, пропускаем.')
+                continue
+            with transaction.atomic():
+                call_command('loaddata', path, verbosity=options['verbosity'])
+                DataFile.objects.mark_loaded(name, checksum)
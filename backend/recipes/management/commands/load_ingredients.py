@@ -0,0 +1,53 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.loaders import file_checksum, read_ingredients, upsert_ingredients
+from recipes.models import DataFile, Ingredient
+from recipes.signals import ingredients_loaded
+
+DEFAULT_PATH = os.path.join(
+    settings.BASE_DIR, 'recipes', 'data', 'ingredients.json'
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает ингредиенты из CSV или JSON пачками. Если файл не '
+        'менялся с прошлой загрузки, ничего не делает.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Загрузить, даже если файл не менялся.',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        name = os.path.basename(path)
+        started = time.perf_counter()
+        checksum = file_checksum(path)
+        if not options['force'] and DataFile.objects.is_loaded(
+            name, checksum
+        ):
+            self.stdout.write(f'{name} не изменился, пропускаем.')
+            return
+        with transaction.atomic():
+            total = upsert_ingredients(
+                read_ingredients(path), options['batch_size']
+            )
+            DataFile.objects.mark_loaded(name, checksum)
+            transaction.on_commit(
+                lambda: ingredients_loaded.send(sender=Ingredient)
+            )
+        self.stdout.write(
+            f'{name}: загружено {total} ингредиентов за '
+            f'{time.perf_counter() - started:.2f} с'
+        )
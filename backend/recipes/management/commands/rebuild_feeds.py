@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import backfill_feed
+from recipes.models import FeedEntry
+from users.models import Follow
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново заполняет входящие ленты подписчиков по их подпискам, '
+        'например после первого развёртывания лент.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='id подписчика; можно указать несколько раз.',
+        )
+
+    def handle(self, *args, **options):
+        follows = Follow.objects.order_by('user_id')
+        if options['users']:
+            follows = follows.filter(user_id__in=options['users'])
+        authors = {}
+        for user_id, following_id in follows.values_list(
+            'user_id', 'following_id'
+        ).iterator():
+            authors.setdefault(user_id, []).append(following_id)
+
+        entries = FeedEntry.objects.all()
+        if options['users']:
+            entries = entries.filter(user_id__in=options['users'])
+        entries.delete()
+        for user_id, author_ids in authors.items():
+            backfill_feed(user_id, author_ids)
+        self.stdout.write(f'Лент пересобрано: {len(authors)}')
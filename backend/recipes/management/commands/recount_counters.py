@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Follow
+
+User = get_user_model()
+
+
+def count_by(model, field):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef('pk')})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+COUNTERS = [
+    (Recipe, 'favorites_count', lambda: count_by(Favorite, 'recipe')),
+    (Recipe, 'in_carts_count', lambda: count_by(ShoppingCart, 'recipe')),
+    (User, 'recipes_count', lambda: count_by(Recipe, 'author')),
+    (User, 'followers_count', lambda: count_by(Follow, 'following')),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики избранного, списков покупок, рецептов '
+        'и подписчиков и исправляет расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать расхождения, ничего не меняя.',
+        )
+
+    def handle(self, *args, **options):
+        for model, field, expression in COUNTERS:
+            with transaction.atomic():
+                drifted = model.objects.annotate(
+                    actual=expression()
+                ).exclude(**{field: F('actual')})
+                total = drifted.count()
+                if total and not options['dry_run']:
+                    model.objects.filter(
+                        pk__in=drifted.values('pk')
+                    ).update(**{field: expression()})
+            self.stdout.write(
+                f'{model._meta.label}.{field}: расхождений {total}'
+            )
@@ -0,0 +1,59 @@
+# Generated by Django 4.2.19 on 2026-10-18 02:45
+
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def variant_names(variants):
+    for size, files in (variants or {}).items():
+        if size != 'source':
+            yield from files.values()
+
+
+def fill_media_files(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    MediaFile = apps.get_model('recipes', 'MediaFile')
+    refs = Counter()
+    for model, field_name, variants_field in (
+        (Recipe, 'image', 'image_variants'),
+        (User, 'avatar', 'avatar_variants'),
+    ):
+        rows = (
+            model.objects.exclude(**{field_name: ''})
+            .exclude(**{f'{field_name}__isnull': True})
+            .values_list(field_name, variants_field)
+        )
+        for name, variants in rows.iterator():
+            refs[name] += 1
+            refs.update(variant_names(variants))
+    MediaFile.objects.bulk_create(
+        (MediaFile(name=name, refs=count) for name, count in refs.items()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0022_recipe_image_variants'),
+        ('users', '0008_user_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Имя файла')),
+                ('refs', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+            ],
+            options={
+                'verbose_name': 'Медиафайл',
+                'verbose_name_plural': 'Медиафайлы',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(fill_media_files, migrations.RunPython.noop),
+    ]
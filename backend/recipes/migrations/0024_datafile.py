@@ -0,0 +1,27 @@
+# Generated by Django 4.2.19 on 2026-10-18 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0023_mediafile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Файл')),
+                ('checksum', models.CharField(max_length=64, verbose_name='Контрольная сумма')),
+                ('loaded_at', models.DateTimeField(auto_now=True, verbose_name='Загружен')),
+            ],
+            options={
+                'verbose_name': 'Файл данных',
+                'verbose_name_plural': 'Файлы данных',
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -1,14 +1,95 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import (Case, Exists, F, IntegerField, OuterRef,
+                              Prefetch, Sum, Value, When, Window)
+from django.db.models.functions import Greatest, RowNumber
 from django.utils import timezone
 
-from foodgram.constants import (MAX_LENGTH_INGREDIENT_MEASUREMENT_UNIT,
-                                MAX_LENGTH_INGREDIENT_NAME, MIN_AMOUNT_VALUE,
-                                MAX_LENGTH_RECIPE_NAME, MIN_COOKING_TIME_VALUE)
+from foodgram.constants import (CHECKSUM_LENGTH, FEED_INBOX_LIMIT,
+                                MAX_LENGTH_DATA_FILE_NAME,
+                                MAX_LENGTH_INGREDIENT_MEASUREMENT_UNIT,
+                                MAX_LENGTH_INGREDIENT_NAME,
+                                MAX_LENGTH_MEDIA_FILE_NAME, MIN_AMOUNT_VALUE,
+                                MAX_LENGTH_RECIPE_NAME, MIN_COOKING_TIME_VALUE,
+                                SEARCH_CONFIG)
+from users.models import Follow, delete_rows, lock_user, touch_user_state
 
 User = get_user_model()
 
+
+class UserRecipeQuerySet(models.QuerySet):
+
+    def add_recipes(self, user_id, recipe_ids):
+        """Добавляет пользователю рецепты одним INSERT.
+
+        bulk_create не отправляет post_save, поэтому счётчики рецептов,
+        список покупок и состояние пользователя обновляются здесь.
+        Возвращает id добавленных рецептов.
+        """
+        with transaction.atomic():
+            lock_user(user_id)
+            existing = set(
+                self.filter(user_id=user_id, recipe_id__in=recipe_ids)
+                .values_list('recipe_id', flat=True)
+            )
+            added = [
+                recipe_id for recipe_id in recipe_ids
+                if recipe_id not in existing
+            ]
+            if added:
+                self.bulk_create(
+                    [
+                        self.model(user_id=user_id, recipe_id=recipe_id)
+                        for recipe_id in added
+                    ],
+                    ignore_conflicts=True,
+                )
+                self.recipes_changed(user_id, added, 1)
+        return added
+
+    def remove_recipes(self, user_id, recipe_ids):
+        """Убирает у пользователя рецепты одним DELETE.
+
+        Возвращает id удалённых рецептов.
+        """
+        with transaction.atomic():
+            lock_user(user_id)
+            rows = dict(
+                self.filter(user_id=user_id, recipe_id__in=recipe_ids)
+                .values_list('pk', 'recipe_id')
+            )
+            removed = list(rows.values())
+            if removed:
+                # У избранного и корзины нет зависимых моделей, а сигналы
+                # здесь не нужны: всё, что они делают, делает
+                # recipes_changed.
+                delete_rows(self.model, list(rows))
+                self.recipes_changed(user_id, removed, -1)
+        return removed
+
+    def recipes_changed(self, user_id, recipe_ids, sign):
+        counter = self.model.recipe_counter
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            **{counter: Greatest(F(counter) + sign, 0)}
+        )
+        if self.model is ShoppingCart:
+            ShoppingListItem.objects.change_amounts(
+                [user_id],
+                {
+                    ingredient_id: sign * total
+                    for ingredient_id, total in RecipeIngredient.objects
+                    .filter(recipe_id__in=recipe_ids)
+                    .values_list('ingredient_id')
+                    .annotate(total=Sum('amount'))
+                    .order_by()
+                },
+            )
+        touch_user_state(user_id)
+
+
 class UserRecipe(models.Model):
     user = models.ForeignKey(
         User,
@@ -21,6 +102,8 @@ class UserRecipe(models.Model):
         on_delete=models.CASCADE,
     )
 
+    objects = UserRecipeQuerySet.as_manager()
+
     class Meta:
         abstract = True
         ordering = ['user']
@@ -34,6 +117,10 @@ class UserRecipe(models.Model):
     def __str__(self):
         return f'{self.user} добавил {self.recipe}'
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 class Ingredient(models.Model):
     name = models.CharField(
         verbose_name='Название',
@@ -90,6 +177,12 @@ class RecipeIngredient(models.Model):
                 name='unique_recipe_ingredient',
             )
         ]
+        indexes = [
+            models.Index(
+                fields=['ingredient', 'recipe'],
+                name='recipe_ingredient_ingredient',
+            ),
+        ]
 
     def __str__(self):
         return (
@@ -98,6 +191,69 @@ class RecipeIngredient(models.Model):
         )
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    def for_read(self, user):
+        """Рецепты со всем, что нужно RecipeReadSerializer.
+
+        Флаги избранного, списка покупок и подписки на автора считаются
+        подзапросами EXISTS, ингредиенты подгружаются одним запросом,
+        поэтому число запросов не зависит от размера страницы.
+        """
+        queryset = self.select_related('author').prefetch_related(
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                ),
+            )
+        )
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                author_is_subscribed=Value(False),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(
+                Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            is_in_shopping_cart=Exists(
+                ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+            ),
+            author_is_subscribed=Exists(
+                Follow.objects.filter(
+                    user=user, following=OuterRef('author')
+                )
+            ),
+        )
+
+    def latest_for_authors(self, author_ids, limit=None):
+        """Последние limit рецептов каждого из авторов одним запросом.
+
+        ROW_NUMBER() OVER (PARTITION BY author_id ORDER BY pub_date DESC)
+        нумерует рецепты внутри автора, фильтр по номеру оставляет первые
+        limit.
+        """
+        recipes = self.filter(author_id__in=author_ids)
+        if limit is not None:
+            recipes = recipes.annotate(
+                row_number=Window(
+                    RowNumber(),
+                    partition_by=F('author_id'),
+                    order_by=[F('pub_date').desc(), F('id').desc()],
+                )
+            ).filter(row_number__lte=limit)
+        return recipes.order_by('author_id', '-pub_date', '-id')
+
+    def latest_by_author(self, author_ids, limit=None):
+        """Словарь {id автора: [рецепты]} из latest_for_authors."""
+        latest = {author_id: [] for author_id in author_ids}
+        for recipe in self.latest_for_authors(author_ids, limit):
+            latest[recipe.author_id].append(recipe)
+        return latest
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -113,6 +269,12 @@ class Recipe(models.Model):
         verbose_name='Картинка',
         upload_to='recipes/',
     )
+    image_variants = models.JSONField(
+        verbose_name='Уменьшенные копии картинки',
+        default=dict,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         verbose_name='Описание',
     )
@@ -130,17 +292,150 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         default=timezone.now,
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        default=timezone.now,
+        editable=False,
+        db_index=True,
+    )
+
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='Добавлений в список покупок',
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        verbose_name='Поисковый вектор',
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_id'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_id',
+            ),
+            models.Index(
+                fields=['cooking_time', '-pub_date'],
+                name='recipe_cooking_time_pub_date',
+            ),
+            GinIndex(fields=['search_vector'], name='recipe_search_vector'),
+            GinIndex(
+                fields=['name'],
+                opclasses=['gin_trgm_ops'],
+                name='recipe_name_trgm',
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        # Не auto_now: loaddata сохраняет в raw-режиме без pre_save.
+        self.updated_at = timezone.now()
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            # Сохранения отдельных полей (копии картинок, счётчики) не
+            # меняют текст рецепта, лишний UPDATE им не нужен.
+            if update_fields is None or {'name', 'text'} & set(
+                update_fields
+            ):
+                self.update_search_vector()
+
+    def ingredient_amounts(self):
+        return dict(
+            self.recipe_ingredients.values_list('ingredient_id', 'amount')
+        )
+
+    def set_ingredients(self, amounts):
+        """Приводит ингредиенты рецепта к amounts.
+
+        amounts — словарь {id ингредиента: количество}. Меняются только
+        отличающиеся строки: новые вставляются, изменённые обновляются,
+        лишние удаляются, по одному запросу на каждое действие и без
+        сигналов на каждую строку. updated_at, индексы и кэши списков
+        обновляет сохранение рецепта, один раз на вызов: сериализатор
+        сохраняет рецепт в той же транзакции. Возвращает количества
+        ингредиентов до изменения.
+        """
+        existing = {
+            ingredient_id: (pk, amount)
+            for pk, ingredient_id, amount in self.recipe_ingredients
+            .values_list('pk', 'ingredient_id', 'amount')
+        }
+        created, updated = [], []
+        for ingredient_id, amount in amounts.items():
+            if ingredient_id not in existing:
+                created.append(RecipeIngredient(
+                    recipe=self, ingredient_id=ingredient_id, amount=amount
+                ))
+            elif existing[ingredient_id][1] != amount:
+                updated.append(RecipeIngredient(
+                    pk=existing[ingredient_id][0], amount=amount
+                ))
+        removed = [
+            pk for ingredient_id, (pk, _) in existing.items()
+            if ingredient_id not in amounts
+        ]
+        delete_rows(RecipeIngredient, removed)
+        if updated:
+            RecipeIngredient.objects.bulk_update(updated, ['amount'])
+        if created:
+            RecipeIngredient.objects.bulk_create(created)
+        return {
+            ingredient_id: amount
+            for ingredient_id, (_, amount) in existing.items()
+        }
+
+    def update_shopping_lists(self, old_amounts, new_amounts=None):
+        """Переносит изменение ингредиентов в списки покупок.
+
+        old_amounts — количества ингредиентов до изменения рецепта,
+        new_amounts — после; если не переданы, читаются из базы.
+        """
+        if new_amounts is None:
+            new_amounts = self.ingredient_amounts()
+        if old_amounts == new_amounts:
+            return
+        ShoppingListItem.objects.change_amounts(
+            self.shopping_carts.values_list('user_id', flat=True),
+            {
+                ingredient_id: (
+                    new_amounts.get(ingredient_id, 0)
+                    - old_amounts.get(ingredient_id, 0)
+                )
+                for ingredient_id in old_amounts.keys() | new_amounts.keys()
+            }
+        )
+
+    def update_search_vector(self):
+        if connection.vendor != 'postgresql':
+            return
+        Recipe.objects.filter(pk=self.pk).update(
+            search_vector=(
+                SearchVector('name', weight='A', config=SEARCH_CONFIG)
+                + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+            )
+        )
+
 
 class Favorite(UserRecipe):
+    recipe_counter = 'favorites_count'
 
     class Meta(UserRecipe.Meta):
         verbose_name = 'Избранное'
@@ -152,6 +447,7 @@ class Favorite(UserRecipe):
 
 
 class ShoppingCart(UserRecipe):
+    recipe_counter = 'in_carts_count'
 
     class Meta(UserRecipe.Meta):
         verbose_name = 'Список покупок'
@@ -160,3 +456,252 @@ class ShoppingCart(UserRecipe):
 
     def __str__(self):
         return f'{self.user} добавил в список покупок {self.recipe}'
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+
+    def change_amounts(self, user_ids, amounts):
+        """Прибавляет amounts к спискам покупок пользователей user_ids.
+
+        amounts — словарь {id ингредиента: изменение количества},
+        изменения могут быть отрицательными. Позиции с нулевым
+        количеством удаляются.
+        """
+        amounts = {
+            ingredient_id: amount
+            for ingredient_id, amount in amounts.items() if amount
+        }
+        user_ids = list(user_ids)
+        if not amounts or not user_ids:
+            return
+        with transaction.atomic():
+            affected = self.filter(
+                user_id__in=user_ids, ingredient_id__in=amounts
+            )
+            existing = set(
+                affected.select_for_update()
+                .values_list('user_id', 'ingredient_id')
+            )
+            if existing:
+                affected.update(amount=F('amount') + Case(
+                    *(
+                        When(ingredient_id=ingredient_id, then=Value(amount))
+                        for ingredient_id, amount in amounts.items()
+                    ),
+                    default=Value(0),
+                    output_field=IntegerField(),
+                ))
+            self.bulk_create(
+                (
+                    ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        amount=amount,
+                    )
+                    for user_id in user_ids
+                    for ingredient_id, amount in amounts.items()
+                    if amount > 0 and (user_id, ingredient_id) not in existing
+                ),
+                ignore_conflicts=True,
+            )
+            affected.filter(amount__lte=0).delete()
+
+
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Поддерживается при добавлении и удалении рецептов из списка покупок
+    и при изменении ингредиентов рецептов, которые в нём лежат.
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Пользователь',
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        verbose_name='Ингредиент',
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество',
+    )
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Позиция списка покупок'
+        verbose_name_plural = 'Позиции списков покупок'
+        ordering = ['user']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.amount}'
+
+
+class FeedEntryQuerySet(models.QuerySet):
+
+    def trim(self, user_ids, limit=FEED_INBOX_LIMIT):
+        """Оставляет в лентах пользователей limit новейших записей."""
+        overflow = self.filter(user_id__in=user_ids).annotate(
+            position=Window(
+                RowNumber(),
+                partition_by=F('user_id'),
+                order_by=[F('pub_date').desc(), F('recipe_id').desc()],
+            )
+        ).filter(position__gt=limit).values('pk')
+        return self.filter(pk__in=overflow).delete()[0]
+
+
+class FeedEntry(models.Model):
+    """Рецепт во входящей ленте подписчика.
+
+    Записи создаются при публикации рецепта и при подписке, дата
+    публикации скопирована из рецепта, чтобы лента читалась одним
+    проходом по индексу (user, pub_date, recipe).
+    """
+
+    user = models.ForeignKey(
+        User,
+        verbose_name='Подписчик',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        verbose_name='Рецепт',
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+    )
+    author = models.ForeignKey(
+        User,
+        verbose_name='Автор',
+        on_delete=models.CASCADE,
+        related_name='+',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    objects = FeedEntryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        ordering = ['user', '-pub_date', '-recipe']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_user_recipe',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_user_pub_date_recipe',
+            ),
+            models.Index(
+                fields=['user', 'author'], name='feed_user_author'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+
+class MediaFileQuerySet(models.QuerySet):
+
+    def acquire(self, name):
+        """Добавляет ссылку на файл name."""
+        with transaction.atomic():
+            media_file, created = self.select_for_update().get_or_create(
+                name=name, defaults={'refs': 1}
+            )
+            if not created:
+                self.filter(pk=media_file.pk).update(refs=F('refs') + 1)
+
+    def release(self, name):
+        """Снимает ссылку на файл name и возвращает число оставшихся.
+
+        Запись с нулём ссылок остаётся: её блокирует удаление файла
+        (ContentAddressedStorage.delete_unreferenced).
+        """
+        with transaction.atomic():
+            media_file = self.select_for_update().filter(name=name).first()
+            if media_file is None or media_file.refs == 0:
+                return 0
+            self.filter(pk=media_file.pk).update(refs=F('refs') - 1)
+            return media_file.refs - 1
+
+
+class MediaFile(models.Model):
+    """Файл в хранилище медиа с именем по хешу содержимого.
+
+    Один файл может быть картинкой нескольких рецептов и аватаров,
+    refs — сколько раз он был сохранён и ещё не удалён.
+    """
+
+    name = models.CharField(
+        max_length=MAX_LENGTH_MEDIA_FILE_NAME,
+        unique=True,
+        verbose_name='Имя файла',
+    )
+    refs = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число ссылок',
+    )
+
+    objects = MediaFileQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+        ordering = ['name']
+
+    def __str__(self):
+        return f'{self.name} ({self.refs})'
+
+
+class DataFileQuerySet(models.QuerySet):
+
+    def is_loaded(self, name, checksum):
+        return self.filter(name=name, checksum=checksum).exists()
+
+    def mark_loaded(self, name, checksum):
+        self.update_or_create(name=name, defaults={'checksum': checksum})
+
+
+class DataFile(models.Model):
+    """Файл с начальными данными и sha256 его последней загрузки."""
+
+    name = models.CharField(
+        max_length=MAX_LENGTH_DATA_FILE_NAME,
+        unique=True,
+        verbose_name='Файл',
+    )
+    checksum = models.CharField(
+        max_length=CHECKSUM_LENGTH,
+        verbose_name='Контрольная сумма',
+    )
+    loaded_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Загружен',
+    )
+
+    objects = DataFileQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Файл данных'
+        verbose_name_plural = 'Файлы данных'
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
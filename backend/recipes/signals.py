@@ -0,0 +1,143 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from recipes.feed import backfill_feed, fan_out_recipe, remove_authors
+from recipes.images import release_image, schedule_variants
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, ShoppingListItem)
+from users.models import Follow, touch_user_state
+from users.signals import followed, unfollowed
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increase_recipe_counter(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            **{sender.recipe_counter: F(sender.recipe_counter) + 1}
+        )
+        touch_user_state(instance.user_id)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_recipe_counter(sender, instance, **kwargs):
+    Recipe.objects.filter(
+        pk=instance.recipe_id, **{f'{sender.recipe_counter}__gt': 0}
+    ).update(**{sender.recipe_counter: F(sender.recipe_counter) - 1})
+    touch_user_state(instance.user_id)
+
+
+@receiver(post_save, sender=Recipe)
+def increase_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.author_id).update(
+            recipes_count=F('recipes_count') + 1
+        )
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(sender, instance, **kwargs):
+    User.objects.filter(pk=instance.author_id).update(
+        recipes_count=Greatest(F('recipes_count') - 1, 0),
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.change_amounts(
+            [instance.user_id], instance.recipe.ingredient_amounts()
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    # pre_delete: ингредиенты рецепта ещё не удалены каскадом.
+    ShoppingListItem.objects.change_amounts(
+        [instance.user_id],
+        {
+            ingredient_id: -amount
+            for ingredient_id, amount
+            in instance.recipe.ingredient_amounts().items()
+        }
+    )
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def touch_recipe_by_ingredient(sender, instance, raw=False, **kwargs):
+    # Ингредиенты — часть рецепта: их правка в обход Recipe.save
+    # (например, в админке ингредиентов рецепта) должна менять
+    # updated_at, по которому строятся ETag и синхронизируются индексы.
+    if not raw:
+        Recipe.objects.filter(pk=instance.recipe_id).update(
+            updated_at=timezone.now()
+        )
+
+
+@receiver(post_save, sender=Ingredient)
+def touch_recipes_by_renamed_ingredient(sender, instance, created, raw,
+                                        **kwargs):
+    # Название и единица измерения входят в ответ рецепта, поэтому
+    # переименование меняет ETag и Last-Modified всех рецептов с ним.
+    if not created and not raw:
+        Recipe.objects.filter(
+            pk__in=RecipeIngredient.objects.filter(
+                ingredient=instance
+            ).values('recipe_id')
+        ).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Recipe)
+def build_recipe_image_variants(sender, instance, raw, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'image', 'image_variants')
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    release_image(instance.image, instance.image_variants)
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        fan_out_recipe.delay(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_followed_feed(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        backfill_feed.delay(instance.user_id, [instance.following_id])
+
+
+@receiver(followed)
+def backfill_batch_followed_feed(sender, user_id, following_ids, **kwargs):
+    backfill_feed.delay(user_id, following_ids)
+
+
+@receiver(post_delete, sender=Follow)
+def clear_unfollowed_feed(sender, instance, **kwargs):
+    remove_authors(instance.user_id, [instance.following_id])
+
+
+@receiver(unfollowed)
+def clear_batch_unfollowed_feed(sender, user_id, following_ids, **kwargs):
+    remove_authors(user_id, following_ids)
+
+
+# Отправляется после массовой загрузки ингредиентов, которая
+# обходит post_save.
+ingredients_loaded = Signal()
+
+# Отправляется после пакетного добавления рецептов в избранное или
+# корзину и удаления из них, которые обходят post_save и post_delete.
+recipes_marked = Signal()
@@ -0,0 +1,80 @@
+import hashlib
+import posixpath
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.utils import validate_file_name
+from django.db import transaction
+
+from foodgram.constants import MEDIA_HASH_PREFIX_LENGTH
+from jobs.queue import job
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище медиа, где имя файла — sha256 его содержимого.
+
+    Одинаковые картинки хранятся один раз: повторное сохранение только
+    увеличивает счётчик ссылок в MediaFile. Файл удаляется с диска
+    фоновой задачей, когда снята последняя ссылка. Содержимое по имени
+    никогда не меняется, поэтому его можно кешировать навсегда.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        validate_file_name(name, allow_relative_path=True)
+        self.media_files().acquire(name)
+        if not self.exists(name):
+            saved = self._save(name, content)
+            # Тот же файл параллельно записал другой запрос.
+            if saved != name:
+                super().delete(saved)
+        return name
+
+    def delete(self, name):
+        if not name or self.media_files().release(name):
+            return
+        delete_unreferenced.delay(name)
+
+    def delete_unreferenced(self, name):
+        # Запись блокируется до удаления файла, поэтому acquire того же
+        # имени ждёт и затем записывает файл заново. Для файлов без
+        # записи она создаётся, чтобы было что блокировать.
+        with transaction.atomic():
+            media_files = self.media_files().select_for_update()
+            media_file, _ = media_files.get_or_create(
+                name=name, defaults={'refs': 0}
+            )
+            # Пока задача ждала в очереди, файл могли сохранить заново.
+            if media_file.refs:
+                return
+            super().delete(name)
+            media_file.delete()
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        digest = digest.hexdigest()
+        directory, filename = posixpath.split(name)
+        extension = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(
+            directory, digest[:MEDIA_HASH_PREFIX_LENGTH], digest + extension
+        )
+
+    @staticmethod
+    def media_files():
+        return apps.get_model('recipes', 'MediaFile').objects
+
+
+@job
+def delete_unreferenced(name):
+    default_storage.delete_unreferenced(name)
@@ -9,7 +9,10 @@ User = get_user_model()
 
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
-    list_display = ('username', 'email', 'first_name', 'last_name')
+    list_display = (
+        'username', 'email', 'first_name', 'last_name',
+        'recipes_count', 'followers_count'
+    )
     search_fields = ('username', 'email')
 
 
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.19 on 2026-10-18 02:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['username', 'id'], name='user_username_id'),
+        ),
+    ]
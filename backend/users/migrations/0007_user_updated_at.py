@@ -0,0 +1,23 @@
+# Generated by Django 4.2.19 on 2026-10-18 02:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_user_username_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='state_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата изменения избранного, покупок и подписок'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.19 on 2026-10-18 02:51
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0008_user_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='updated_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now, editable=False, verbose_name='Дата изменения'),
+        ),
+    ]
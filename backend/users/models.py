@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
 
 from foodgram.constants import (MAX_LENGTH_USER_FIRST_NAME,
                                 MAX_LENGTH_USER_LAST_NAME)
@@ -25,15 +28,127 @@ class User(AbstractUser):
     )
     avatar = models.ImageField(
         upload_to='avatars/', null=True, blank=True, verbose_name='Аватар')
+    avatar_variants = models.JSONField(
+        default=dict, blank=True, editable=False,
+        verbose_name='Уменьшенные копии аватара')
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Количество рецептов')
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False, verbose_name='Количество подписчиков')
+    updated_at = models.DateTimeField(
+        default=timezone.now, editable=False, db_index=True,
+        verbose_name='Дата изменения')
+    state_updated_at = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        verbose_name='Дата изменения избранного, покупок и подписок')
 
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
         ordering = ['username']
+        indexes = [
+            models.Index(fields=['username', 'id'], name='user_username_id'),
+        ]
 
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        # Не auto_now: loaddata сохраняет в raw-режиме без pre_save.
+        self.updated_at = timezone.now()
+        super().save(*args, **kwargs)
+
+
+def touch_user_state(user_id):
+    """Отмечает изменение избранного, списка покупок или подписок."""
+    User.objects.filter(pk=user_id).update(state_updated_at=timezone.now())
+
+
+def lock_user(user_id):
+    """Блокирует строку пользователя до конца транзакции.
+
+    Пакетные изменения избранного, корзины и подписок одного
+    пользователя выполняются по очереди, и счётчики не расходятся.
+    """
+    list(
+        User.objects.select_for_update().filter(pk=user_id).values_list('pk')
+    )
+
+
+def delete_rows(model, pks):
+    """Удаляет строки model по первичным ключам одним DELETE.
+
+    В отличие от QuerySet.delete() не загружает объекты и не отправляет
+    pre_delete и post_delete: их работу делает вызывающий код. Только
+    для моделей, на которые никто не ссылается.
+    """
+    if not pks:
+        return
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} '
+            f'WHERE {quote(model._meta.pk.column)} '
+            f'IN ({", ".join(["%s"] * len(pks))})',
+            list(pks),
+        )
+
+
+class FollowQuerySet(models.QuerySet):
+
+    def follow_many(self, user_id, following_ids):
+        """Подписывает пользователя на авторов одним INSERT.
+
+        bulk_create не отправляет post_save, поэтому счётчики подписчиков
+        и состояние пользователя обновляются здесь. Возвращает id новых
+        подписок.
+        """
+        with transaction.atomic():
+            lock_user(user_id)
+            existing = set(
+                self.filter(user_id=user_id, following_id__in=following_ids)
+                .values_list('following_id', flat=True)
+            )
+            added = [
+                following_id for following_id in following_ids
+                if following_id not in existing
+            ]
+            if added:
+                self.bulk_create(
+                    [
+                        Follow(user_id=user_id, following_id=following_id)
+                        for following_id in added
+                    ],
+                    ignore_conflicts=True,
+                )
+                User.objects.filter(pk__in=added).update(
+                    followers_count=F('followers_count') + 1
+                )
+                touch_user_state(user_id)
+        return added
+
+    def unfollow_many(self, user_id, following_ids):
+        """Отписывает пользователя от авторов одним DELETE.
+
+        Возвращает id удалённых подписок.
+        """
+        with transaction.atomic():
+            lock_user(user_id)
+            rows = dict(
+                self.filter(user_id=user_id, following_id__in=following_ids)
+                .values_list('pk', 'following_id')
+            )
+            removed = list(rows.values())
+            if removed:
+                # У подписок нет зависимых моделей, а сигналы здесь
+                # не нужны: счётчики обновляются ниже.
+                delete_rows(self.model, list(rows))
+                User.objects.filter(pk__in=removed).update(
+                    followers_count=Greatest(F('followers_count') - 1, 0)
+                )
+                touch_user_state(user_id)
+        return removed
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -49,6 +164,8 @@ class Follow(models.Model):
         related_name='following',
     )
 
+    objects = FollowQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
@@ -62,3 +179,7 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user} подписчик автора - {self.following}'
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from recipes.images import release_image, schedule_variants
+from users.models import Follow, touch_user_state
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Follow)
+def increase_followers_count(sender, instance, created, **kwargs):
+    if created:
+        User.objects.filter(pk=instance.following_id).update(
+            followers_count=F('followers_count') + 1
+        )
+        touch_user_state(instance.user_id)
+
+
+@receiver(post_delete, sender=Follow)
+def decrease_followers_count(sender, instance, **kwargs):
+    User.objects.filter(
+        pk=instance.following_id, followers_count__gt=0
+    ).update(followers_count=F('followers_count') - 1)
+    touch_user_state(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def build_avatar_variants(sender, instance, raw, **kwargs):
+    if not raw:
+        schedule_variants(instance, 'avatar', 'avatar_variants')
+
+
+@receiver(post_delete, sender=User)
+def release_avatar(sender, instance, **kwargs):
+    release_image(instance.avatar, instance.avatar_variants)
+
+
+# Отправляются после пакетной подписки и отписки, которые обходят
+# post_save и post_delete.
+followed = Signal()
+unfollowed = Signal()